@@ -1,27 +1,111 @@
-from flask import Flask, render_template_string, request, send_file, redirect, url_for, session
-import pandas as pd
+from flask import Flask, render_template_string, request, send_file, redirect, url_for, session, jsonify, g
 import json
-import seaborn as sns
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from bs4 import BeautifulSoup
 import warnings
-import base64
-import io
 import os
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
-from reportlab.lib import colors
-from PIL import Image as PILImage
+import re
+import time
+from markupsafe import escape
+from cache import ResultCache, cache_key
+from jobs import JobManager
+from uploads import GrowingUpload, UploadTooLarge, UploadWriter, stream_parts
+from artifacts import ArtifactStore
+from metrics import MetricsRegistry, server_timing
+from regions import region_name, region_names
+
+# pandas, matplotlib, seaborn and reportlab are only imported by report.py, on the first analysis.
+# Serving pages, polls and downloads never loads them; a pre-fork warm-up (gunicorn.conf.py) can.
+os.environ.setdefault('MPLBACKEND', 'Agg')
+REPORT_EXPORTS = ['load_data', 'generate_plots', 'generate_pdf', 'analyze_file', 'analyze_regions']
+
+def __getattr__(name):
+    # Project.load_data and friends keep working without importing report.py up front
+    if name in REPORT_EXPORTS:
+        import report
+        return getattr(report, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Suppress warnings
 warnings.filterwarnings("ignore")
 
 app = Flask(__name__)
 app.secret_key = 'youtube_analyzer_secret_key'
+# Rows per chunk for bounded-memory CSV ingestion; unset reads the whole upload at once
+app.config['CSV_CHUNKSIZE'] = int(os.environ.get('GYR_CSV_CHUNKSIZE', 0)) or None
+# CSV parser backend: 'c', 'pyarrow', or 'auto' to use pyarrow when it is installed
+app.config['CSV_ENGINE'] = os.environ.get('GYR_CSV_ENGINE', 'c')
+# Processes used to render the figures of one report concurrently; 0 or 1 renders them in turn
+app.config['PLOT_WORKERS'] = int(os.environ.get('GYR_PLOT_WORKERS', 0))
+# Processes parsing the files of a multi-region upload side by side
+app.config['REGION_WORKERS'] = int(os.environ.get('GYR_REGION_WORKERS', os.cpu_count() or 1))
+# Scatter plots over more rows than this are drawn as a 2-D histogram with SCATTER_BINS bins per axis
+app.config['SCATTER_MAX_ROWS'] = int(os.environ.get('GYR_SCATTER_MAX_ROWS', 100000))
+app.config['SCATTER_BINS'] = int(os.environ.get('GYR_SCATTER_BINS', 200))
+# 'videos' rolls the daily trending rows up to one row per video before the summary and plots
+app.config['ANALYSIS_LEVEL'] = os.environ.get('GYR_ANALYSIS_LEVEL', 'rows')
+# Keywords searched for in video descriptions, comma separated; None uses keywords.KEYWORDS
+app.config['KEYWORDS'] = [kw.strip() for kw in os.environ['GYR_KEYWORDS'].split(',') if kw.strip()] if os.environ.get('GYR_KEYWORDS') else None
+# Result cache for repeated uploads: in-process LRU in front of a shared on-disk LRU
+app.config['RESULT_CACHE_BYTES'] = int(os.environ.get('GYR_CACHE_MB', 256)) * 1024 * 1024
+app.config['RESULT_CACHE_DIR'] = os.environ.get('GYR_CACHE_DIR', os.path.join(os.getcwd(), 'cache'))
+app.config['RESULT_CACHE_DISK_BYTES'] = int(os.environ.get('GYR_CACHE_DISK_MB', 1024)) * 1024 * 1024
+# Bytes of query indexes each worker keeps loaded for /api/stats
+app.config['INDEX_CACHE_BYTES'] = int(os.environ.get('GYR_INDEX_CACHE_MB', 256)) * 1024 * 1024
+# Per-job artifact directories (upload, status, outputs), expired by age and by total size
+app.config['JOB_DIR'] = os.environ.get('GYR_JOB_DIR', os.path.join(os.getcwd(), 'jobs'))
+app.config['ARTIFACT_TTL'] = int(os.environ.get('GYR_ARTIFACT_TTL', 3600))
+app.config['ARTIFACT_MAX_BYTES'] = int(os.environ.get('GYR_ARTIFACT_MAX_MB', 2048)) * 1024 * 1024
+# Uploads larger than this are refused: up front when the request declares its length, otherwise
+# as soon as that many bytes have arrived
+app.config['MAX_UPLOAD_BYTES'] = int(os.environ.get('GYR_MAX_UPLOAD_MB', 1024)) * 1024 * 1024
+# A lone CSV starts parsing while it arrives once this much of it is in, if a job worker is spare;
+# smaller uploads (and cache hits among them) never take a worker before they are complete
+app.config['SPECULATE_BYTES'] = int(os.environ.get('GYR_SPECULATE_MB', 32)) * 1024 * 1024
+# Background analysis: a bounded pool of workers behind every web worker
+app.config['JOB_WORKERS'] = int(os.environ.get('GYR_JOB_WORKERS', os.cpu_count() or 1))
+app.config['JOB_MAX_PENDING'] = int(os.environ.get('GYR_JOB_MAX_PENDING', 32))
+app.config['JOB_EXECUTOR'] = os.environ.get('GYR_JOB_EXECUTOR', 'process')
+# Directory where web workers share their metric counts so /metrics on any of them reports the
+# whole server (gunicorn.conf.py sets a fresh one); unset keeps the counts of each process to itself
+app.config['METRICS_DIR'] = os.environ.get('GYR_METRICS_DIR') or None
+
+result_cache = ResultCache(
+    app.config['RESULT_CACHE_BYTES'],
+    directory=app.config['RESULT_CACHE_DIR'],
+    max_disk_bytes=app.config['RESULT_CACHE_DISK_BYTES'],
+)
+artifact_store = ArtifactStore(
+    app.config['JOB_DIR'],
+    ttl=app.config['ARTIFACT_TTL'],
+    max_bytes=app.config['ARTIFACT_MAX_BYTES'],
+)
+metrics = MetricsRegistry(directory=app.config['METRICS_DIR'])
+metrics.describe('gyr_stage_duration_seconds', 'histogram', 'Wall time of one analysis stage')
+metrics.describe('gyr_stage_peak_rss_bytes', 'gauge', 'Peak RSS of the process that ran the stage, during its last run seen by this worker')
+metrics.describe('gyr_stage_rows_total', 'counter', 'Rows handled by a stage')
+metrics.describe('gyr_stage_frame_bytes', 'gauge', 'Size of the analysed frame after a compaction stage, at its last run seen by this worker')
+metrics.describe('gyr_analyses_total', 'counter', 'Finished analyses by outcome')
+metrics.describe('gyr_request_duration_seconds', 'histogram', 'Time to answer an HTTP request')
+for name in ['hits', 'disk_hits', 'misses', 'evictions', 'entries', 'bytes', 'disk_entries', 'disk_bytes']:
+    metrics.describe(f'gyr_result_cache_{name}', 'gauge', f'Result cache {name.replace("_", " ")} in this worker')
+
+def record_job(job_id, status):
+    # Stage timings come back inside the job result; only fresh analyses carry them
+    metrics.inc('gyr_analyses_total', outcome=status.get('state', 'failed'))
+    if status.get('state') == 'done':
+        metrics.observe_stages(job_manager.result(job_id).get('stages', []))
+
+job_manager = JobManager(
+    artifact_store,
+    max_workers=app.config['JOB_WORKERS'],
+    max_pending=app.config['JOB_MAX_PENDING'],
+    executor=app.config['JOB_EXECUTOR'],
+    on_done=record_job,
+)
+
+# Bump when the shape of a cached result changes so older cache entries are not reused, and
+# when keywords.KEYWORDS changes (the default keyword list is keyed as None)
+RESULT_VERSION = 8
+PLOT_NAME_RE = re.compile(r'^plot_\d+\.png$')
 
 # HTML for landing page (modified from user's code)
 LANDING_HTML = """
@@ -842,7 +926,7 @@ UPLOAD_HTML = """
 
         <main class="upload-section">
             <h1>Upload Your Data</h1>
-            <p class="subtitle">Drop your CSV file below and we'll transform it into insights</p>
+            <p class="subtitle">Drop your CSV file below and we'll transform it into insights. Add several regions (with their *_category_id.json maps) for one combined report</p>
 
             <form action="/analyze" method="post" enctype="multipart/form-data">
                 <div class="drop-zone" id="dropZone">
@@ -861,7 +945,7 @@ UPLOAD_HTML = """
 
                 <div class="or-divider">or</div>
 
-                <input type="file" id="fileInput" name="file" class="file-input" accept=".csv">
+                <input type="file" id="fileInput" name="file" class="file-input" accept=".csv,.json" multiple>
                 <button class="browse-btn" id="browseBtn" type="button">
                     <svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
                         <path d="M3 15v4c0 1.1.9 2 2 2h14a2 2 0 0 0 2-2v-4M17 8l-5-5-5 5M12 3v12"/>
@@ -928,6 +1012,7 @@ UPLOAD_HTML = """
         dropZone.addEventListener('drop', (e) => {
             e.preventDefault();
             dropZone.classList.remove('drag-over');
+            fileInput.files = e.dataTransfer.files;
             handleFiles(e.dataTransfer.files);
         });
 
@@ -941,16 +1026,16 @@ UPLOAD_HTML = """
         function handleFiles(files) {
             if (files.length === 0) return;
 
-            const file = files[0];
+            const list = Array.from(files);
             
-            if (!file.name.endsWith('.csv')) {
-                alert('Please upload a CSV file');
+            if (!list.some(f => f.name.endsWith('.csv')) || !list.every(f => f.name.endsWith('.csv') || f.name.endsWith('.json'))) {
+                alert('Please upload CSV files, optionally with their category JSON maps');
                 return;
             }
 
-            selectedFile = file;
-            fileName.textContent = file.name;
-            fileSize.textContent = formatFileSize(file.size);
+            selectedFile = list[0];
+            fileName.textContent = list.map(f => f.name).join(', ');
+            fileSize.textContent = formatFileSize(list.reduce((total, f) => total + f.size, 0));
             
             setTimeout(() => {
                 fileInfo.classList.add('show');
@@ -972,177 +1057,260 @@ UPLOAD_HTML = """
 </html>
 """
 
-def load_data(file_path, cat_path=None):
-    # Load categories if available
-    cat_dict = {}
-    if cat_path and os.path.exists(cat_path):
-        try:
-            with open(cat_path, encoding='utf-8') as f:
-                data = json.load(f)
-            cat_dict = {int(item['id']): item['snippet']['title'] for item in data['items']}
-        except:
-            pass
-
-    # Load CSV
+# Shown while a background analysis runs; polls the job status and moves on to the results
+PENDING_HTML = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>Analyzing - GYR</title>
+    <style>
+        body { font-family: Arial, sans-serif; background: #0A0E27; color: #FFF8F0; padding: 20px; }
+        a { color: #8B7FD8; text-decoration: none; }
+        a:hover { text-decoration: underline; }
+        .error { color: #FF6B6B; }
+    </style>
+</head>
+<body>
+    <h1>Analyzing your data...</h1>
+    <p id="status">Job {{ job_id }} is queued.</p>
+    <a href="/">Back to Home</a>
+    <script>
+        const statusEl = document.getElementById('status');
+        function poll() {
+            fetch('/status/{{ job_id }}')
+                .then(r => r.json())
+                .then(job => {
+                    if (job.state === 'done') {
+                        window.location = '/result/{{ job_id }}';
+                    } else if (job.state === 'failed') {
+                        statusEl.className = 'error';
+                        statusEl.textContent = 'An error occurred during analysis: ' + job.error;
+                    } else {
+                        statusEl.textContent = 'Job {{ job_id }} is ' + job.state + '.';
+                        setTimeout(poll, 1000);
+                    }
+                })
+                .catch(() => setTimeout(poll, 2000));
+        }
+        poll();
+    </script>
+</body>
+</html>
+"""
+
+def analysis_settings():
+    # Everything besides the uploaded bytes that can change the summary, plots or PDF
+    return {
+        'version': RESULT_VERSION,
+        'chunksize': app.config['CSV_CHUNKSIZE'],
+        'engine': app.config['CSV_ENGINE'],
+        'keywords': app.config['KEYWORDS'],
+        'scatter_max_rows': app.config['SCATTER_MAX_ROWS'],
+        'scatter_bins': app.config['SCATTER_BINS'],
+        'level': app.config['ANALYSIS_LEVEL'],
+    }
+
+def tags_text(tags):
+    # The top tags under the summary on the results page
+    if not len(tags.top):
+        return ''
+    return '\n\n' + tags.top.round(0).to_string(index=False)
+
+def run_analysis(file_path, pdf_path):
+    from report import analyze_file
+    analysis = analyze_file(
+        file_path, pdf_path,
+        chunksize=app.config['CSV_CHUNKSIZE'],
+        engine=app.config['CSV_ENGINE'],
+        keywords=app.config['KEYWORDS'],
+        plot_workers=app.config['PLOT_WORKERS'],
+        scatter_max_rows=app.config['SCATTER_MAX_ROWS'],
+        scatter_bins=app.config['SCATTER_BINS'],
+        level=app.config['ANALYSIS_LEVEL'],
+    )
+    app.logger.info("Ingest: %s", analysis['ingest'])
+    app.logger.info("Frame memory: %s", analysis['memory'])
+    with open(pdf_path, 'rb') as f:
+        pdf = f.read()
+
+    # One statistics pass shared by the page, the CSV download, the plots and the PDF
+    stats = analysis['stats']
+    return {
+        'summary_csv': stats.to_csv(),
+        'summary_text': stats.to_string() + tags_text(analysis['tags']),
+        'plots': analysis['plots'],
+        'pdf': pdf,
+        'index': analysis['index'].to_bytes(),
+        'stages': analysis['stages'],
+    }
+
+def run_regions(regions, pdf_path):
+    from report import analyze_regions
+    analysis = analyze_regions(
+        regions, pdf_path,
+        workers=app.config['REGION_WORKERS'],
+        chunksize=app.config['CSV_CHUNKSIZE'],
+        engine=app.config['CSV_ENGINE'],
+        keywords=app.config['KEYWORDS'],
+        plot_workers=app.config['PLOT_WORKERS'],
+        scatter_max_rows=app.config['SCATTER_MAX_ROWS'],
+        scatter_bins=app.config['SCATTER_BINS'],
+        level=app.config['ANALYSIS_LEVEL'],
+    )
+    app.logger.info("Ingest: %s", analysis['ingest'])
+    with open(pdf_path, 'rb') as f:
+        pdf = f.read()
+
+    # Cross-region summary first, then one row per region
+    stats = analysis['stats']
+    return {
+        'summary_csv': stats.to_csv(),
+        'summary_text': stats.to_string() + '\n\n' + analysis['regions'].to_string() + tags_text(analysis['tags']),
+        'plots': analysis['plots'],
+        'pdf': pdf,
+        'index': analysis['index'].to_bytes(),
+        'stages': analysis['stages'],
+    }
+
+def publish_result(job_id, result):
+    # Write the downloadable outputs and plot images next to the upload; the job result
+    # keeps only what the results page renders inline
+    if not artifact_store.exists(job_id, 'report.pdf'):
+        artifact_store.write(job_id, 'report.pdf', result['pdf'])
+    artifact_store.write(job_id, 'summary.csv', result['summary_csv'].encode('utf-8'))
+    artifact_store.write(job_id, 'stats_index.npz', result['index'])
+    plot_names = []
+    for i, png in enumerate(result['plots']):
+        plot_names.append(f'plot_{i}.png')
+        artifact_store.write(job_id, plot_names[-1], png)
+    return {
+        'summary_text': result['summary_text'],
+        'plots': plot_names,
+    }
+
+def analyze_job(job_id, key=None):
+    # Runs in a job worker; the disk tier of the cache is shared with the web workers. Without a
+    # key the upload is still arriving: parsing follows it, and the key comes with its end.
+    file_path = artifact_store.path(job_id, 'uploaded.csv')
+    source = file_path if key else GrowingUpload(file_path)
+    result = run_analysis(source, artifact_store.path(job_id, 'report.pdf'))
+    result_cache.put(key or source.info()['key'], result)
+    return dict(publish_result(job_id, result), stages=result['stages'])
+
+def analyze_regions_job(job_id, key):
+    with open(artifact_store.path(job_id, 'regions.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    regions = [(name, artifact_store.path(job_id, csv_name), cat_name and artifact_store.path(job_id, cat_name))
+               for name, csv_name, cat_name in manifest]
+    result = run_regions(regions, artifact_store.path(job_id, 'report.pdf'))
+    result_cache.put(key, result)
+    return dict(publish_result(job_id, result), stages=result['stages'])
+
+def save_regions(job_id, csv_parts, cat_parts):
+    # Uploads are stored under generated names; regions.json maps each region to its CSV and
+    # category map. A map named after no uploaded region applies to all of them if it is the only one.
+    cat_by_region = {region_name(part.filename): part for part in cat_parts}
+    fallback = next(iter(cat_by_region.values())) if len(cat_by_region) == 1 else None
+
+    manifest, digests = [], []
+    for name, part in zip(region_names([p.filename for p in csv_parts]), csv_parts):
+        cat = cat_by_region.get(region_name(part.filename), fallback)
+        manifest.append([name, os.path.basename(part.path), cat and os.path.basename(cat.path)])
+        digests.append(f"{name}={part.digest()}+{cat.digest() if cat else ''}")
+    artifact_store.write(job_id, 'regions.json', json.dumps(manifest).encode('utf-8'))
+    return ';'.join(digests)
+
+def receive_upload(job_id):
+    # Streams the multipart body into the job directory. Once SPECULATE_BYTES of a first file that
+    # is a CSV have arrived, an analysis job starts parsing it while the rest arrives; a second
+    # file turns the upload into a multi-region one and that job is cancelled.
+    csv_parts, cat_parts, writer, first, speculative = [], [], None, None, None
+    boundary = request.mimetype_params.get('boundary', '')
     try:
-        df = pd.read_csv(file_path, encoding='utf-8')
-    except UnicodeDecodeError:
-        try:
-            df = pd.read_csv(file_path, encoding='utf-8-sig')
-        except UnicodeDecodeError:
-            df = pd.read_csv(file_path, encoding='latin1')
-
-    # Map categories if available
-    if cat_dict:
-        df['category'] = df['category_id'].map(cat_dict)
-
-    # Data cleaning
-    df['trending_date'] = pd.to_datetime(df['trending_date'], format='%y.%d.%m', errors='coerce')
-    df['publish_time'] = pd.to_datetime(df['publish_time'], errors='coerce').dt.tz_localize(None)
-    if 'trending_date' in df and 'publish_time' in df:
-        df['days_to_trend'] = (df['trending_date'] - df['publish_time']).dt.days
-    df.dropna(subset=['views', 'likes', 'dislikes', 'comment_count'], inplace=True)
-
-    return df
-
-def generate_plots(df):
-    plots = []
-    # Correlation
-    plt.figure()
-    corr = df[['views', 'likes', 'dislikes', 'comment_count']].corr()
-    sns.heatmap(corr, annot=True, cmap='coolwarm')
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    plot_data = base64.b64encode(buf.read()).decode('utf-8')
-    plots.append(f"data:image/png;base64,{plot_data}")
-    plt.close()
-
-    # Views by category
-    if 'category' in df:
-        plt.figure(figsize=(12,6))
-        sns.barplot(x='category', y='views', data=df.groupby('category')['views'].mean().reset_index())
-        plt.xticks(rotation=45)
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        plot_data = base64.b64encode(buf.read()).decode('utf-8')
-        plots.append(f"data:image/png;base64,{plot_data}")
-        plt.close()
-
-    # Engagement
-    df['engagement_rate'] = (df['likes'] + df['dislikes'] + df['comment_count']) / df['views']
-    plt.figure()
-    sns.scatterplot(x='views', y='engagement_rate', data=df)
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    plot_data = base64.b64encode(buf.read()).decode('utf-8')
-    plots.append(f"data:image/png;base64,{plot_data}")
-    plt.close()
-
-    # Title length
-    if 'title' in df:
-        df['title_length'] = df['title'].str.len()
-        plt.figure()
-        sns.histplot(df['title_length'])
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        plot_data = base64.b64encode(buf.read()).decode('utf-8')
-        plots.append(f"data:image/png;base64,{plot_data}")
-        plt.close()
-
-    # Tags count
-    if 'tags' in df:
-        df['tags_count'] = df['tags'].str.split('|').str.len()
-        plt.figure()
-        sns.scatterplot(x='tags_count', y='views', data=df)
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        plot_data = base64.b64encode(buf.read()).decode('utf-8')
-        plots.append(f"data:image/png;base64,{plot_data}")
-        plt.close()
-
-    # Keywords
-    if 'description' in df:
-        def extract_keywords(description):
-            if pd.isna(description):
-                return []
-            soup = BeautifulSoup(description, 'html.parser')
-            text = soup.get_text()
-            keywords = ['music', 'fun', 'viral', 'challenge', 'tutorial']
-            return [kw for kw in keywords if kw.lower() in text.lower()]
-
-        df['keywords'] = df['description'].apply(extract_keywords)
-        df['keyword_count'] = df['keywords'].str.len()
-        plt.figure()
-        sns.scatterplot(x='keyword_count', y='views', data=df)
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        plot_data = base64.b64encode(buf.read()).decode('utf-8')
-        plots.append(f"data:image/png;base64,{plot_data}")
-        plt.close()
-
-    return plots
-
-def generate_pdf(df, plots):
-    pdf_path = os.path.join(os.getcwd(), 'static', 'report.pdf')
-    doc = SimpleDocTemplate(pdf_path, pagesize=letter)
-    styles = getSampleStyleSheet()
-    styles['Normal'].fontName = 'Courier'  # Monospaced font for better formatting
-    styles['Normal'].fontSize = 10
-    story = []
-
-    # Title
-    story.append(Paragraph("YouTube Trending Video Analysis Report", styles['Title']))
-    story.append(Spacer(1, 12))
-
-    # Data Summary
-    story.append(Paragraph("Data Summary:", styles['Heading2']))
-    summary_df = df.describe().round(2)
-    data = [['Statistic'] + summary_df.columns.tolist()] + [[idx] + row.tolist() for idx, row in summary_df.iterrows()]
-    colWidths = [80] + [70] * len(summary_df.columns)
-    table = Table(data, colWidths=colWidths)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-    ]))
-    story.append(table)
-    story.append(Spacer(1, 12))
-
-    # Key Insights
-    story.append(Paragraph("Key Insights:", styles['Heading2']))
-    insights = [
-        "- High engagement (likes/comments) often leads to more views.",
-        "- Certain categories like Music dominate trending lists.",
-        "- Videos with specific keywords or tags may trend faster.",
-        "- Analyze title length and publish timing for better reach."
-    ]
-    for insight in insights:
-        story.append(Paragraph(insight, styles['Normal']))
-    story.append(Spacer(1, 12))
-
-    # Plots
-    story.append(Paragraph("Plots:", styles['Heading2']))
-    for plot in plots:
-        decoded = base64.b64decode(plot.split(',')[1])
-        img = Image(io.BytesIO(decoded))
-        img.drawHeight = 300
-        img.drawWidth = 500
-        story.append(img)
-        story.append(Spacer(1, 12))
-
-    doc.build(story)
+        for event, *rest in stream_parts(request.stream, boundary, app.config['MAX_UPLOAD_BYTES']):
+            if event == 'data':
+                if writer is not None:
+                    writer.write(rest[0])
+                    if (writer is first and speculative is None and writer.size >= app.config['SPECULATE_BYTES']
+                            and job_manager.spare()):
+                        speculative = writer
+                        job_manager.submit(job_id, analyze_job, job_id)
+                continue
+            if writer is not None:
+                writer.close()
+                writer = None
+            field, filename = rest
+            if event != 'file' or field != 'file' or not filename:
+                continue
+            if filename.endswith('.csv'):
+                name = 'uploaded.csv' if not csv_parts and not cat_parts else f'region_{len(csv_parts)}.csv'
+                writer = UploadWriter(artifact_store.path(job_id, name), filename)
+                csv_parts.append(writer)
+            elif filename.endswith('.json'):
+                writer = UploadWriter(artifact_store.path(job_id, f'categories_{len(cat_parts)}.json'), filename)
+                cat_parts.append(writer)
+            else:
+                raise ValueError("Please upload CSV files, optionally with their *_category_id.json maps")
+
+            if len(csv_parts) + len(cat_parts) == 1:
+                first = writer if csv_parts else None
+            elif first is not None:
+                first = None
+                if speculative is not None:
+                    # The job is free again for the multi-region analysis
+                    speculative.cancel()
+                    job_manager.requeue(job_id)
+    except Exception as e:
+        for part in csv_parts + cat_parts:
+            part.fail(str(e))
+        raise
+    if writer is not None:
+        writer.close()
+    return csv_parts, cat_parts, speculative
+
+def render_results(result, job_id):
+    # The summary carries text from the upload (tags, region names from file names), so it is
+    # escaped here rather than trusted from the cached result
+    results_html = f"""
+    <!DOCTYPE html>
+    <html lang="en">
+    <head>
+        <meta charset="UTF-8">
+        <title>Analysis Results - GYR</title>
+        <style>
+            body {{ font-family: Arial, sans-serif; background: #0A0E27; color: #FFF8F0; padding: 20px; }}
+            .plot {{ margin: 20px 0; }}
+            .download {{ margin: 20px 0; }}
+            a {{ color: #8B7FD8; text-decoration: none; }}
+            a:hover {{ text-decoration: underline; }}
+            pre {{ background: #1A1F3A; padding: 10px; border-radius: 5px; overflow-x: auto; }}
+            ul {{ list-style-type: disc; margin-left: 20px; }}
+        </style>
+    </head>
+    <body>
+        <h1>Analysis Results</h1>
+        <h2>Data Summary</h2>
+        <pre>{escape(result['summary_text'])}</pre>
+        <h2>Plots</h2>
+        {"".join(f'<div class="plot"><img src="/plots/{job_id}/{plot}" alt="Plot" style="max-width: 100%; height: auto;"></div>' for plot in result['plots'])}
+        <h2>Key Insights</h2>
+        <ul>
+            <li>High engagement (likes/comments) often leads to more views.</li>
+            <li>Certain categories like Music dominate trending lists.</li>
+            <li>Videos with specific keywords or tags may trend faster.</li>
+            <li>Analyze title length and publish timing for better reach.</li>
+        </ul>
+        <div class="download">
+            <a href="/download_pdf/{job_id}">Download Full PDF Report</a> | 
+            <a href="/download_csv/{job_id}">Download CSV Summary</a> | 
+            <a href="/api/stats/{job_id}">Query API (JSON)</a>
+        </div>
+        <a href="/">Back to Home</a>
+    </body>
+    </html>
+    """
+    return results_html
 
 @app.route('/')
 def landing():
@@ -1154,86 +1322,197 @@ def upload():
 
 @app.route('/analyze', methods=['POST'])
 def analyze():
-    if 'file' not in request.files:
+    if request.mimetype != 'multipart/form-data':
         return "No file uploaded", 400
-    file = request.files['file']
-    if file.filename == '':
-        return "No file selected", 400
-    if not file.filename.endswith('.csv'):
-        return "Please upload a CSV file", 400
-    
-    # Save uploaded file temporarily
-    file_path = 'static/uploaded.csv'
-    file.save(file_path)
-    
+    # Refuse a declared oversize body before reading any of it
+    if request.content_length is not None and request.content_length > app.config['MAX_UPLOAD_BYTES']:
+        return f"Upload is larger than the {app.config['MAX_UPLOAD_BYTES'] // (1024 * 1024)} MB limit", 413
+
+    if job_manager.busy():
+        return "Too many analyses in progress, please try again shortly", 503
+
+    # Save the upload inside its job's directory so concurrent jobs never share an input file
+    phases = []
+    start = time.perf_counter()
+    artifact_store.maybe_collect()
+    job_id = job_manager.create()
+
     try:
-        # Load data
-        df = load_data(file_path)
-        
-        summary_csv = df.describe().to_csv()
-        session['summary_csv'] = summary_csv
-        
-        # Generate plots
-        plots = generate_plots(df)
-        
-        # Generate PDF
-        generate_pdf(df, plots)
-        
-        # Render results
-        results_html = f"""
-        <!DOCTYPE html>
-        <html lang="en">
-        <head>
-            <meta charset="UTF-8">
-            <title>Analysis Results - GYR</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; background: #0A0E27; color: #FFF8F0; padding: 20px; }}
-                .plot {{ margin: 20px 0; }}
-                .download {{ margin: 20px 0; }}
-                a {{ color: #8B7FD8; text-decoration: none; }}
-                a:hover {{ text-decoration: underline; }}
-                pre {{ background: #1A1F3A; padding: 10px; border-radius: 5px; overflow-x: auto; }}
-                ul {{ list-style-type: disc; margin-left: 20px; }}
-            </style>
-        </head>
-        <body>
-            <h1>Analysis Results</h1>
-            <h2>Data Summary</h2>
-            <pre>{df.describe().to_string()}</pre>
-            <h2>Plots</h2>
-            {"".join(f'<div class="plot"><img src="{plot}" alt="Plot" style="max-width: 100%; height: auto;"></div>' for plot in plots)}
-            <h2>Key Insights</h2>
-            <ul>
-                <li>High engagement (likes/comments) often leads to more views.</li>
-                <li>Certain categories like Music dominate trending lists.</li>
-                <li>Videos with specific keywords or tags may trend faster.</li>
-                <li>Analyze title length and publish timing for better reach.</li>
-            </ul>
-            <div class="download">
-                <a href="/download_pdf">Download Full PDF Report</a> | 
-                <a href="/download_csv">Download CSV Summary</a>
-            </div>
-            <a href="/">Back to Home</a>
-        </body>
-        </html>
-        """
-        return results_html
+        csv_parts, cat_parts, speculative = receive_upload(job_id)
+    except UploadTooLarge as e:
+        job_manager.fail(job_id, str(e))
+        return str(e), 413
+    except ValueError as e:
+        job_manager.fail(job_id, str(e))
+        return str(e), 400
     except Exception as e:
-        return f"An error occurred during analysis: {str(e)}", 500
+        # e.g. the client went away mid-upload
+        job_manager.fail(job_id, str(e))
+        raise
+    phases.append(('receive', time.perf_counter() - start))
+    if not csv_parts:
+        error = "No file selected" if not cat_parts else "Please upload CSV files, optionally with their *_category_id.json maps"
+        job_manager.fail(job_id, error)
+        return error, 400
+
+    try:
+        # Identical bytes analyzed with identical settings are served from the cache; the
+        # digests were computed while the files arrived
+        start = time.perf_counter()
+        if len(csv_parts) + len(cat_parts) == 1:
+            key, job = cache_key(csv_parts[0].digest(), analysis_settings()), None
+        else:
+            key, job = cache_key(save_regions(job_id, csv_parts, cat_parts), analysis_settings()), analyze_regions_job
+        phases.append(('digest', time.perf_counter() - start))
+
+        start = time.perf_counter()
+        result = result_cache.get(key)
+        phases.append(('cache', time.perf_counter() - start))
+        start = time.perf_counter()
+        if result is None and speculative is not None and job is None:
+            # The job parsing the upload may finish now
+            speculative.finish(key=key)
+            phases.append(('submit', time.perf_counter() - start))
+        elif result is None:
+            job_manager.submit(job_id, job or analyze_job, job_id, key)
+            phases.append(('submit', time.perf_counter() - start))
+        else:
+            if speculative is not None and job is None:
+                speculative.cancel()
+            job_manager.complete(job_id, publish_result(job_id, result))
+            metrics.inc('gyr_analyses_total', outcome='cached')
+            phases.append(('publish', time.perf_counter() - start))
+    except Exception as e:
+        if speculative is not None:
+            speculative.fail(str(e))
+        # Otherwise the job stays queued: its page polls forever and collection never removes it
+        job_manager.fail(job_id, str(e))
+        return f"An error occurred during analysis: {escape(str(e))}", 500
+
+    g.server_timing = phases
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'job_id': job_id, 'status_url': url_for('job_status', job_id=job_id)}), 202
+    return render_template_string(PENDING_HTML, job_id=job_id), 202
+
+@app.route('/status/<job_id>')
+def job_status(job_id):
+    status = job_manager.status(job_id)
+    if status is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(status)
+
+@app.route('/result/<job_id>')
+def job_result(job_id):
+    status = job_manager.status(job_id)
+    if status is None:
+        return "Job not found.", 404
+    if status['state'] == 'failed':
+        return f"An error occurred during analysis: {escape(status.get('error'))}", 500
+    if status['state'] != 'done':
+        return render_template_string(PENDING_HTML, job_id=job_id), 202
+
+    result = job_manager.result(job_id)
+    session['job_id'] = job_id
+    g.server_timing = [(entry['stage'], entry['seconds']) for entry in result.get('stages', [])]
+    return render_results(result, job_id)
+
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+@app.route('/metrics')
+def prometheus_metrics():
+    cache = result_cache.stats()
+    for name in ['hits', 'disk_hits', 'misses', 'evictions', 'entries', 'bytes', 'disk_entries', 'disk_bytes']:
+        metrics.set(f'gyr_result_cache_{name}', cache[name])
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def finish_timer(response):
+    # Every request is timed; handlers that break their work into phases also report them
+    elapsed = time.perf_counter() - g.get('request_start', time.perf_counter())
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.observe('gyr_request_duration_seconds', elapsed, route=route, method=request.method)
+    if g.get('server_timing'):
+        response.headers['Server-Timing'] = server_timing(g.server_timing + [('request', elapsed)])
+    return response
+
+@app.route('/api/stats')
+def api_stats_latest():
+    # The dataset of the last result this browser viewed
+    if 'job_id' not in session:
+        return jsonify({'error': 'No analysis viewed yet'}), 404
+    return api_stats(session['job_id'])
+
+@app.route('/api/stats/<job_id>')
+def api_stats(job_id):
+    # Filtered aggregates from the job's columnar index, e.g.
+    # /api/stats/<job_id>?from=2018-01-01&to=2018-01-31&category=Music&group=channel
+    from query import GROUP_LIMIT, LABELS, PERCENTILES, QueryError, cached_index
+    start = time.perf_counter()
+    path = artifact_store.path(job_id, 'stats_index.npz')
+    if path is None or not os.path.exists(path):
+        return jsonify({'error': 'No query index for this job'}), 404
+    index = cached_index(path, os.path.getmtime(path), app.config['INDEX_CACHE_BYTES'])
+    phases = [('load', time.perf_counter() - start)]
+
+    start = time.perf_counter()
+    try:
+        percentiles = [float(p) for p in request.args.get('percentiles', '').split(',') if p.strip()] or PERCENTILES
+        if not all(0 <= p <= 100 for p in percentiles):
+            raise QueryError("Percentiles must be between 0 and 100")
+        result = index.query(
+            start=request.args.get('from'),
+            end=request.args.get('to'),
+            group=request.args.get('group'),
+            percentiles=percentiles,
+            limit=int(request.args.get('limit', GROUP_LIMIT)),
+            **{label: request.args.getlist(label) for label in LABELS},
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    phases.append(('query', time.perf_counter() - start))
+    g.server_timing = phases
+    return jsonify(result)
 
 @app.route('/download_pdf')
 def download_pdf():
-    pdf_path = os.path.join(os.getcwd(), 'static', 'report.pdf')
-    try:
-        return send_file(pdf_path, as_attachment=True, download_name='report.pdf')
-    except FileNotFoundError:
+    # The report of the last result this browser viewed
+    if 'job_id' not in session:
         return "Report not found. Please generate the report first.", 404
+    return redirect(url_for('download_job_pdf', job_id=session['job_id']))
+
+@app.route('/download_pdf/<job_id>')
+def download_job_pdf(job_id):
+    if not artifact_store.exists(job_id, 'report.pdf'):
+        return "Report not found. Please generate the report first.", 404
+    return send_file(artifact_store.path(job_id, 'report.pdf'), as_attachment=True, download_name='report.pdf')
+
+@app.route('/plots/<job_id>/<name>')
+def job_plot(job_id, name):
+    # Job artifacts never change once written, so browsers may keep them for the job's lifetime
+    if not PLOT_NAME_RE.match(name) or not artifact_store.exists(job_id, name):
+        return "Plot not found.", 404
+    response = send_file(artifact_store.path(job_id, name), mimetype='image/png', max_age=app.config['ARTIFACT_TTL'])
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/download_csv/<job_id>')
+def download_job_csv(job_id):
+    if not artifact_store.exists(job_id, 'summary.csv'):
+        return "Summary not found. Please generate the report first.", 404
+    return send_file(artifact_store.path(job_id, 'summary.csv'), as_attachment=True, download_name='summary.csv', mimetype='text/csv')
 
 @app.route('/download_csv')
 def download_csv():
-    if 'summary_csv' not in session:
+    # The summary of the last result this browser viewed
+    if 'job_id' not in session:
         return "Summary not found. Please generate the report first.", 404
-    return send_file(io.BytesIO(session['summary_csv'].encode()), as_attachment=True, download_name='summary.csv', mimetype='text/csv')
+    return redirect(url_for('download_job_csv', job_id=session['job_id']))
 
 
 
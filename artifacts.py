@@ -0,0 +1,126 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+# Jobs in these states are no longer writing; unfinished jobs are never evicted for quota
+TERMINAL_STATES = ('done', 'failed')
+# An unfinished job only expires after this many TTLs: far longer than any analysis, so a job still
+# running is never removed under it, yet a job orphaned by a crashed worker goes eventually
+UNFINISHED_TTLS = 24
+
+
+def atomic_write(path, data):
+    # Readers see either the old file or the complete new one, never a partial write
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def tree_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except FileNotFoundError:
+                pass
+    return total
+
+
+class ArtifactStore:
+    # One directory per job holding its upload and every output. Directories expire after
+    # ttl seconds, and the oldest finished ones are removed first when over max_bytes.
+
+    def __init__(self, directory, ttl, max_bytes, gc_interval=60):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.gc_interval = gc_interval
+        self._last_gc = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def create(self):
+        job_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(self.directory, job_id))
+        return job_id
+
+    def job_dir(self, job_id):
+        if not JOB_ID_RE.match(job_id or ''):
+            return None
+        return os.path.join(self.directory, job_id)
+
+    def path(self, job_id, name):
+        job_dir = self.job_dir(job_id)
+        if job_dir is None or os.path.basename(name) != name:
+            return None
+        return os.path.join(job_dir, name)
+
+    def exists(self, job_id, name):
+        path = self.path(job_id, name)
+        return path is not None and os.path.exists(path)
+
+    def write(self, job_id, name, data):
+        path = self.path(job_id, name)
+        atomic_write(path, data)
+        return path
+
+    def _jobs(self):
+        jobs = []
+        for job_id in os.listdir(self.directory):
+            job_dir = os.path.join(self.directory, job_id)
+            if not JOB_ID_RE.match(job_id) or not os.path.isdir(job_dir):
+                continue
+            status_path = os.path.join(job_dir, 'status.json')
+            try:
+                mtime = os.path.getmtime(job_dir)
+            except OSError:
+                continue
+            finished = False
+            try:
+                mtime = max(mtime, os.path.getmtime(status_path))
+                with open(status_path, encoding='utf-8') as f:
+                    finished = json.load(f).get('state') in TERMINAL_STATES
+            except OSError:
+                pass  # status not written yet
+            except ValueError:
+                finished = True
+            jobs.append((mtime, job_id, finished))
+        return sorted(jobs)
+
+    def collect(self):
+        # Expire by age first, then trim the oldest finished jobs until under quota
+        removed = 0
+        now = time.time()
+        kept = []
+        for mtime, job_id, finished in self._jobs():
+            if now - mtime > (self.ttl if finished else self.ttl * UNFINISHED_TTLS):
+                shutil.rmtree(os.path.join(self.directory, job_id), ignore_errors=True)
+                removed += 1
+            else:
+                kept.append((mtime, job_id, finished, tree_size(os.path.join(self.directory, job_id))))
+
+        total = sum(size for *_, size in kept)
+        for mtime, job_id, finished, size in kept:
+            if total <= self.max_bytes:
+                break
+            if not finished:
+                continue
+            shutil.rmtree(os.path.join(self.directory, job_id), ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def maybe_collect(self):
+        # Cheap enough to call on every upload; does real work at most once per gc_interval
+        with self._lock:
+            if time.time() - self._last_gc < self.gc_interval:
+                return 0
+            self._last_gc = time.time()
+        return self.collect()
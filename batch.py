@@ -0,0 +1,166 @@
+# Headless report generation over many regional files, without Flask or a server.
+#   python batch.py data/ --out reports
+#   python batch.py "data/*videos.csv" --workers 4 --chunksize 200000
+#   python batch.py data/ --summary-only   # summary.csv alone, in memory that does not grow with the file
+# Each XXvideos.csv is paired with XX_category_id.json from the same directory when present.
+import argparse
+import glob
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from ingest import load_categories, stream_stats
+from keywords import KEYWORDS
+from regions import CATEGORY_MAP_SUFFIX, region_name, region_names
+from report import analyze_file, analyze_regions
+from artifacts import atomic_write
+
+# Chunk size of --summary-only runs that do not set --chunksize
+SUMMARY_CHUNKSIZE = 100000
+
+
+def find_inputs(patterns):
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.extend(sorted(glob.glob(os.path.join(pattern, '*.csv'))))
+        else:
+            files.extend(sorted(glob.glob(pattern)))
+    # Keep the first occurrence of each file, in the order given
+    return list(dict.fromkeys(os.path.abspath(f) for f in files))
+
+
+def category_file(csv_path, categories=None):
+    if categories:
+        return categories
+    candidate = os.path.join(os.path.dirname(csv_path), region_name(csv_path) + CATEGORY_MAP_SUFFIX)
+    return candidate if os.path.exists(candidate) else None
+
+
+def output_dirs(out, files):
+    # One sub-directory per input, named after the file. Inputs sharing a name (a/US.csv and
+    # b/US.csv) also get their parent directory's name, and a digest of their path if that still
+    # collides, so no report overwrites another.
+    stems = [os.path.splitext(os.path.basename(f))[0] for f in files]
+    names = [f"{os.path.basename(os.path.dirname(f))}_{stem}" if stems.count(stem) > 1 else stem
+             for f, stem in zip(files, stems)]
+    names = [f"{name}_{hashlib.sha256(f.encode('utf-8')).hexdigest()[:8]}" if names.count(name) > 1 else name
+             for f, name in zip(files, names)]
+    return {f: os.path.join(out, name) for f, name in zip(files, names)}
+
+
+def run_file(csv_path, out_dir, cat_path, options):
+    # Runs in a pool worker: one full report per input file
+    start = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    analysis = analyze_file(csv_path, os.path.join(out_dir, 'report.pdf'), cat_path, **options)
+    atomic_write(os.path.join(out_dir, 'summary.csv'), analysis['stats'].to_csv().encode('utf-8'))
+    for i, png in enumerate(analysis['plots']):
+        atomic_write(os.path.join(out_dir, f'plot_{i}.png'), png)
+    timings = dict(analysis['timings'], total_ms=(time.perf_counter() - start) * 1000)
+    return {'rows': analysis['stats'].rows, 'timings': timings}
+
+
+def run_summary(csv_path, out_dir, cat_path, options):
+    # Runs in a pool worker: summary.csv only, every chunk folded into StreamingStats and dropped.
+    # Quantiles come from its sketch; everything else matches the full report's summary.
+    start = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    stats, report = stream_stats(csv_path, load_categories(cat_path), options['chunksize'] or SUMMARY_CHUNKSIZE,
+                                 options['keywords'])
+    summary = stats.result()
+    atomic_write(os.path.join(out_dir, 'summary.csv'), summary.to_csv().encode('utf-8'))
+    total_ms = (time.perf_counter() - start) * 1000
+    timings = {'load_ms': report['parse_ms'], 'stats_ms': total_ms - report['parse_ms'], 'plots_ms': 0.0,
+               'pdf_ms': 0.0, 'total_ms': total_ms}
+    return {'rows': summary.rows, 'timings': timings}
+
+
+def run_combined(files, out_dir, categories, workers, options):
+    # Every input as one region of a single report, parsed side by side
+    regions = [(name, f, category_file(f, categories)) for name, f in zip(region_names(files), files)]
+    os.makedirs(out_dir, exist_ok=True)
+    analysis = analyze_regions(regions, os.path.join(out_dir, 'report.pdf'), workers=workers, **options)
+    atomic_write(os.path.join(out_dir, 'summary.csv'), analysis['stats'].to_csv().encode('utf-8'))
+    atomic_write(os.path.join(out_dir, 'regions.csv'), analysis['regions'].to_csv().encode('utf-8'))
+    for i, png in enumerate(analysis['plots']):
+        atomic_write(os.path.join(out_dir, f'plot_{i}.png'), png)
+    print(analysis['regions'].to_string())
+    print(' '.join(f"{k[:-3]}={v / 1000:.2f}s" for k, v in analysis['timings'].items()))
+
+
+def print_summary(results, elapsed):
+    # One line per input, under the name of its output directory
+    print(f"\n{'report':<28} {'rows':>9} {'load':>8} {'stats':>8} {'plots':>8} {'pdf':>8} {'total':>8}")
+    for name, result in results:
+        if 'error' in result:
+            print(f"{name:<28} failed: {result['error']}")
+            continue
+        t = result['timings']
+        print(f"{name:<28} {result['rows']:>9} " + ' '.join(
+            f"{t[k] / 1000:>7.2f}s" for k in ['load_ms', 'stats_ms', 'plots_ms', 'pdf_ms', 'total_ms']))
+    failed = sum('error' in result for _, result in results)
+    print(f"\n{len(results) - failed} reports, {failed} failed, {elapsed:.2f}s wall clock")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a PDF report, CSV summary and plots per trending CSV.")
+    parser.add_argument('inputs', nargs='+', help="CSV files, directories or glob patterns")
+    parser.add_argument('--out', default='reports', help="one sub-directory per input file is written here")
+    parser.add_argument('--categories', help="category JSON for every input, instead of XX_category_id.json")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--combine', action='store_true', help="write one multi-region report to <out>/combined")
+    parser.add_argument('--chunksize', type=int, default=None)
+    parser.add_argument('--engine', default='c', choices=['c', 'pyarrow', 'auto'])
+    parser.add_argument('--keywords', default=','.join(KEYWORDS))
+    parser.add_argument('--scatter-max-rows', type=int, default=100000)
+    parser.add_argument('--scatter-bins', type=int, default=200)
+    parser.add_argument('--level', default='rows', choices=['rows', 'videos'],
+                        help="'videos' summarizes and plots one row per video instead of one per trending day")
+    parser.add_argument('--summary-only', action='store_true',
+                        help="write summary.csv alone from streamed chunks, keeping no rows in memory")
+    args = parser.parse_args(argv)
+    if args.summary_only and (args.combine or args.level == 'videos'):
+        parser.error("--summary-only streams each file on its own, one row per trending day")
+
+    files = find_inputs(args.inputs)
+    if not files:
+        parser.error("no CSV files matched")
+    options = {
+        'chunksize': args.chunksize,
+        'engine': args.engine,
+        'keywords': [kw.strip() for kw in args.keywords.split(',') if kw.strip()],
+        'scatter_max_rows': args.scatter_max_rows,
+        'scatter_bins': args.scatter_bins,
+        'level': args.level,
+    }
+
+    if args.combine:
+        run_combined(files, os.path.join(args.out, 'combined'), args.categories, args.workers, options)
+        return 0
+
+    start = time.perf_counter()
+    results = {}
+    out_dirs = output_dirs(args.out, files)
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(files)))) as pool:
+        futures = {
+            pool.submit(run_summary if args.summary_only else run_file, f, out_dirs[f],
+                        category_file(f, args.categories), options): f
+            for f in files
+        }
+        for future in as_completed(futures):
+            csv_path = futures[future]
+            try:
+                results[csv_path] = future.result()
+                print(f"done   {csv_path} -> {out_dirs[csv_path]}")
+            except Exception as e:
+                results[csv_path] = {'error': f"{type(e).__name__}: {e}"}
+                print(f"failed {csv_path}: {e}", file=sys.stderr)
+    print_summary([(os.path.basename(out_dirs[f]), results[f]) for f in files], time.perf_counter() - start)
+    return 1 if any('error' in r for r in results.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+# Compare the per-row BeautifulSoup keyword extraction with the vectorized KeywordMatcher.
+#   python -m benchmarks.bench_keywords --rows 200000
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from keywords import KEYWORDS, extract_keywords, get_matcher
+
+WORDS = ['music', 'Funny', 'viral', 'CHALLENGE', 'tutorial', 'official', 'video', 'subscribe',
+         'http://www.youtube.com/watch', '\\n', '&amp;', 'mu&#115;ic', 'vlog', 'live', 'news']
+
+
+def make_descriptions(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(5, 60, rows)
+    words = rng.choice(WORDS, lengths.sum())
+    out, pos = [], 0
+    for n in lengths:
+        chunk = words[pos:pos + n]
+        pos += n
+        out.append('<p>' + ' '.join(chunk[:n // 2]) + '</p> <a href="https://fun.example">' + ' '.join(chunk[n // 2:]) + '</a>')
+    descriptions = pd.Series(out, dtype=object)
+    descriptions[::13] = np.nan
+    return descriptions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--keywords', default=','.join(KEYWORDS))
+    args = parser.parse_args()
+    keywords = [kw for kw in args.keywords.split(',') if kw]
+
+    descriptions = make_descriptions(args.rows)
+
+    start = time.perf_counter()
+    expected = descriptions.apply(lambda d: len(extract_keywords(d, keywords)))
+    reference = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matcher = get_matcher(tuple(keywords))
+    counts = matcher.counts(matcher.masks(descriptions))
+    vectorized = time.perf_counter() - start
+
+    assert np.array_equal(expected.to_numpy(), counts), "keyword_count differs from the reference"
+    print(f"rows={args.rows} keywords={len(keywords)}")
+    print(f"beautifulsoup  {reference:8.3f}s")
+    print(f"vectorized     {vectorized:8.3f}s  ({reference / vectorized:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+# Stage-by-stage time and memory of the whole pipeline on synthetic data, plus the full
+# /analyze request through Flask's test client. Results are written as JSON and can be
+# compared against a stored baseline; a stage slower than the baseline by more than
+# --tolerance fails the run.
+#   python -m benchmarks.bench_pipeline --scales 10000,100000,1000000 --output bench.json
+#   python -m benchmarks.bench_pipeline --scales 100000 --baseline bench.json
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import ensure_dataset
+
+# Stages faster than this are reported but never counted as regressions; they are mostly noise
+NOISE_SECONDS = 0.05
+
+
+def measure(fn, repeat=1, memory=True):
+    # Best wall time over repeat runs, then one more run under tracemalloc for the peak
+    # of Python-visible allocations (NumPy and pandas buffers included)
+    best, result = None, None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    entry = {'seconds': round(best, 4)}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        entry['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+    return entry, result
+
+
+def start_app(workdir):
+    # Jobs run on threads so the request can be timed to completion in this process; caching
+    # is off so every request does the full analysis
+    os.environ.update({
+        'GYR_JOB_EXECUTOR': 'thread',
+        'GYR_JOB_WORKERS': '1',
+        'GYR_CACHE_MB': '0',
+        'GYR_CACHE_DISK_MB': '0',
+        'GYR_CACHE_DIR': os.path.join(workdir, 'cache'),
+        'GYR_JOB_DIR': os.path.join(workdir, 'jobs'),
+    })
+    import Project
+    return Project.app.test_client()
+
+
+def analyze_request(client, csv_path):
+    with open(csv_path, 'rb') as f:
+        response = client.post('/analyze', data={'file': (f, 'synthetic.csv')},
+                               content_type='multipart/form-data', headers={'Accept': 'application/json'})
+    assert response.status_code == 202, response.data
+    job_id = response.json['job_id']
+    while True:
+        state = client.get(f'/status/{job_id}').json['state']
+        if state in ('done', 'failed'):
+            break
+        time.sleep(0.01)
+    assert state == 'done', client.get(f'/status/{job_id}').json
+    assert client.get(f'/result/{job_id}').status_code == 200
+
+
+def run_scale(rows, data_dir, client, repeat, memory, scatter_max_rows):
+    from features import add_features
+    from ingest import compact_frame
+    from report import load_data, plot_tasks, generate_pdf
+    from stats import compute_stats
+
+    csv_path, cat_path = ensure_dataset(data_dir, rows)
+    results = {}
+
+    results['load_data'], df = measure(lambda: load_data(csv_path, cat_path), repeat, memory)
+    results['add_features'], _ = measure(lambda: add_features(df.copy()), repeat, memory)
+    add_features(df)
+    results['compact_frame'], frame = measure(lambda: compact_frame(df.copy()), repeat, memory)
+    results['compact_frame'].update({k.replace('bytes', 'mb'): round(v / 2**20, 1) for k, v in frame.items()})
+    compact_frame(df)
+    results['compute_stats'], stats = measure(lambda: compute_stats(df), repeat, memory)
+
+    plots = []
+    for i, (fn, args) in enumerate(plot_tasks(df, stats, scatter_max_rows=scatter_max_rows)):
+        results[f'plot_{i}:{fn.__name__}'], png = measure(lambda: fn(*args), repeat, memory)
+        plots.append(png)
+
+    pdf_path = os.path.join(tempfile.gettempdir(), f'gyr-bench-{os.getpid()}.pdf')
+    results['generate_pdf'], _ = measure(lambda: generate_pdf(df, plots, pdf_path, stats=stats), repeat, memory)
+    os.remove(pdf_path)
+    del df, plots
+
+    if client is not None:
+        results['analyze_request'], _ = measure(lambda: analyze_request(client, csv_path), repeat, memory)
+    return results
+
+
+def compare(current, baseline, tolerance):
+    # Returns (scale, stage, baseline seconds, current seconds) for every regression
+    regressions = []
+    print(f"\n{'scale':>9} {'stage':<34} {'baseline':>9} {'current':>9} {'change':>8}")
+    for scale, stages in current['results'].items():
+        for stage, entry in stages.items():
+            old = baseline.get('results', {}).get(scale, {}).get(stage)
+            if old is None:
+                continue
+            ratio = entry['seconds'] / old['seconds'] if old['seconds'] else float('inf')
+            slower = ratio > 1 + tolerance and entry['seconds'] - old['seconds'] > NOISE_SECONDS
+            print(f"{scale:>9} {stage:<34} {old['seconds']:>8.3f}s {entry['seconds']:>8.3f}s {ratio - 1:>+7.0%}"
+                  + ('  REGRESSION' if slower else ''))
+            if slower:
+                regressions.append((scale, stage, old['seconds'], entry['seconds']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', default='10000,100000,1000000',
+                        help="comma separated row counts, e.g. 10000,100000,1000000,10000000")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'gyr-bench-data'),
+                        help="generated CSVs are kept here and reused between runs")
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    parser.add_argument('--no-request', action='store_true', help="skip the full /analyze request")
+    parser.add_argument('--scatter-max-rows', type=int, default=100000)
+    parser.add_argument('--output', help="write results as JSON here")
+    parser.add_argument('--baseline', help="JSON from an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='gyr-bench-')
+    client = None if args.no_request else start_app(workdir)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': {},
+    }
+    for rows in [int(s) for s in args.scales.split(',')]:
+        results = run_scale(rows, args.data_dir, client, args.repeat, not args.no_memory, args.scatter_max_rows)
+        report['results'][str(rows)] = results
+        print(f"\nrows={rows}")
+        for stage, entry in results.items():
+            print(f"  {stage:<34} {entry['seconds']:>8.3f}s" + (f" {entry['peak_mb']:>8.1f} MB" if 'peak_mb' in entry else ''))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) slower than the baseline by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+# Filtered aggregates for the JSON API: pandas masks and groupby over the analysed frame against
+# the date-sorted, code-based StatsIndex. --tile repeats the frame to reach several million rows.
+#   python -m benchmarks.bench_query --rows 1000000 --tile 3
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import ensure_dataset
+from query import StatsIndex
+
+
+def best_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def with_pandas(df, start=None, end=None, group='category', **filters):
+    mask = np.ones(len(df), dtype=bool)
+    if start:
+        mask &= df['trending_date'].to_numpy() >= np.datetime64(start)
+    if end:
+        mask &= df['trending_date'].to_numpy() < np.datetime64(end) + np.timedelta64(1, 'D')
+    for label, column in [('category', 'category'), ('channel', 'channel_title')]:
+        if filters.get(label):
+            mask &= df[column].isin(filters[label]).to_numpy()
+    sub = df[mask]
+    key = sub['trending_date'].dt.normalize() if group == 'date' else sub[{'channel': 'channel_title'}.get(group, group)]
+    return (len(sub), sub['views'].mean(), sub['engagement_rate'].quantile([0.1, 0.25, 0.5, 0.75, 0.9, 0.99]),
+            sub.groupby(key, observed=True)['views'].agg(['size', 'mean']))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--tile', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'gyr-bench-data'))
+    args = parser.parse_args()
+
+    from features import add_features
+    from ingest import compact_frame
+    from report import load_data
+
+    csv_path, cat_path = ensure_dataset(args.data_dir, args.rows)
+    df = load_data(csv_path, cat_path)
+    add_features(df)
+    compact_frame(df)
+    df = pd.concat([df] * args.tile, ignore_index=True)
+    for column in ['category', 'channel_title']:
+        df[column] = df[column].astype('category')
+
+    start = time.perf_counter()
+    index = StatsIndex.build(df)
+    build_seconds = time.perf_counter() - start
+    channel = df['channel_title'].value_counts().index[0]
+    category = df['category'].value_counts().index[0]
+    print(f"rows={index.rows} channels={len(index.arrays['channel_names'])} build={build_seconds:.2f}s"
+          f" size={len(index.to_bytes()) / 2**20:.0f} MB")
+
+    queries = [
+        ('everything', {}),
+        ('one month', {'start': '2018-01-01', 'end': '2018-01-31'}),
+        ('one category', {'category': [category]}),
+        ('month + category', {'start': '2018-01-01', 'end': '2018-01-31', 'category': [category]}),
+        ('channel by date', {'channel': [channel], 'group': 'date'}),
+        ('month by channel', {'start': '2018-01-01', 'end': '2018-01-31', 'group': 'channel'}),
+    ]
+    print(f"{'query':<18} {'rows':>9} {'pandas':>9} {'index':>9}")
+    for name, params in queries:
+        result = index.query(**params)
+        expected = with_pandas(df, **params)
+        assert result['rows'] == expected[0]
+        old = best_ms(lambda: with_pandas(df, **params), args.repeat)
+        new = best_ms(lambda: index.query(**params), args.repeat)
+        print(f"{name:<18} {result['rows']:>9} {old:>7.1f}ms {new:>7.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+# Summary and plots over every trending row versus over the video-level rollup.
+#   python -m benchmarks.bench_rollup --rows 1000000
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import ensure_dataset
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--scatter-max-rows', type=int, default=100000)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'gyr-bench-data'))
+    args = parser.parse_args()
+
+    from features import add_features
+    from plots import render_plots
+    from report import load_data, plot_tasks
+    from rollup import video_rollup
+    from stats import compute_stats
+
+    csv_path, cat_path = ensure_dataset(args.data_dir, args.rows)
+    df = load_data(csv_path, cat_path)
+    add_features(df)
+    videos, rollup_seconds = timed(lambda: video_rollup(df))
+    print(f"rows={len(df)} videos={len(videos)} ({len(df) / len(videos):.1f}x fewer) rollup={rollup_seconds:.3f}s")
+
+    print(f"{'level':<7} {'rows':>9} {'stats':>8} {'plots':>8} {'total':>8}")
+    for level, frame, extra in [('rows', df, 0.0), ('videos', videos, rollup_seconds)]:
+        stats, stats_seconds = timed(lambda: compute_stats(frame))
+        _, plot_seconds = timed(lambda: render_plots(plot_tasks(frame, stats, args.scatter_max_rows)))
+        print(f"{level:<7} {len(frame):>9} {stats_seconds:>7.3f}s {plot_seconds:>7.3f}s"
+              f" {extra + stats_seconds + plot_seconds:>7.3f}s")
+
+
+if __name__ == '__main__':
+    main()
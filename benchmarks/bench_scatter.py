@@ -0,0 +1,49 @@
+# Render time of the per-point scatter against the binned scatter as the row count grows.
+# The binned path includes the histogram itself, its only step that touches every row.
+#   python -m benchmarks.bench_scatter --rows 10000,100000,1000000,4000000
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from plots import bin_scatter, binned_scatter_plot, scatter_plot
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    views = rng.lognormal(11, 2, rows).round()
+    likes = (views * rng.beta(2, 40, rows)).round()
+    return pd.DataFrame({
+        'views': views,
+        'engagement_rate': likes / views,
+    })
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', default='10000,100000,1000000,4000000')
+    parser.add_argument('--bins', type=int, default=200)
+    parser.add_argument('--points-max', type=int, default=1000000,
+                        help="skip the per-point scatter above this many rows")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'points':>9} {'binning':>9} {'binned':>9}")
+    for rows in [int(r) for r in args.rows.split(',')]:
+        df = make_frame(rows)
+        points = f"{timed(scatter_plot, df, 'views', 'engagement_rate'):8.3f}s" if rows <= args.points_max else '-'
+        start = time.perf_counter()
+        binned = bin_scatter(df, 'views', 'engagement_rate', args.bins)
+        binning = time.perf_counter() - start
+        render = timed(binned_scatter_plot, binned, 'views', 'engagement_rate')
+        print(f"{rows:>10} {points:>9} {binning:>8.3f}s {binning + render:>8.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Cold start of a web worker: import time of Project, the first page, and the first and second
+# analysis, each scenario in a fresh interpreter. --warm-up runs report.warm_up() first, as the
+# gunicorn master does before forking. --repo points at another checkout to compare against it.
+#   python -m benchmarks.bench_startup --rows 20000
+#   python -m benchmarks.bench_startup --repo /path/to/older/checkout
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synthetic import ensure_dataset
+
+CHILD = '''
+import json, os, sys, time
+csv_path, pdf_path, warm = sys.argv[1], sys.argv[2], sys.argv[3] == '1'
+out = {}
+start = time.perf_counter()
+if warm:
+    import report
+    report.warm_up()
+    out['warm_up'] = time.perf_counter() - start
+start = time.perf_counter()
+import Project
+out['import'] = time.perf_counter() - start
+client = Project.app.test_client()
+start = time.perf_counter()
+client.get('/')
+out['first_page'] = time.perf_counter() - start
+start = time.perf_counter()
+Project.run_analysis(csv_path, pdf_path)
+out['first_analysis'] = time.perf_counter() - start
+start = time.perf_counter()
+Project.run_analysis(csv_path, pdf_path)
+out['second_analysis'] = time.perf_counter() - start
+print(json.dumps(out))
+'''
+
+
+def run_child(repo, csv_path, warm, workdir):
+    env = dict(os.environ, GYR_CACHE_DIR=os.path.join(workdir, 'cache'), GYR_JOB_DIR=os.path.join(workdir, 'jobs'),
+               GYR_JOB_EXECUTOR='thread')
+    pdf_path = os.path.join(workdir, 'report.pdf')
+    output = subprocess.run([sys.executable, '-c', CHILD, csv_path, pdf_path, '1' if warm else '0'],
+                            cwd=repo, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3, help="fresh processes per scenario; the median is shown")
+    parser.add_argument('--repo', default=os.getcwd(), help="checkout whose Project.py is measured")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'gyr-bench-data'))
+    args = parser.parse_args()
+
+    csv_path, _ = ensure_dataset(args.data_dir, args.rows)
+    workdir = tempfile.mkdtemp(prefix='gyr-startup-')
+    scenarios = [('cold', False)]
+    with open(os.path.join(args.repo, 'report.py'), encoding='utf-8') as f:
+        if 'def warm_up(' in f.read():
+            scenarios.append(('warmed', True))
+
+    print(f"repo={args.repo} rows={args.rows}")
+    print(f"{'scenario':<8} {'warm_up':>9} {'import':>9} {'first_page':>11} {'first_analysis':>15} {'second_analysis':>16}")
+    for name, warm in scenarios:
+        runs = [run_child(args.repo, csv_path, warm, workdir) for _ in range(args.repeat)]
+        median = {k: sorted(r[k] for r in runs)[len(runs) // 2] for k in runs[0]}
+        print(f"{name:<8} {median.get('warm_up', 0):>8.3f}s {median['import']:>8.3f}s {median['first_page']:>10.3f}s"
+              f" {median['first_analysis']:>14.3f}s {median['second_analysis']:>15.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# Check StreamingStats against pandas: chunks are split across several partial accumulators
+# (as separate workers would) and merged, then compared with describe()/corr() on the full frame.
+#   python -m benchmarks.bench_streaming_stats --rows 1000000 --parts 4
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from stats import CORR_COLUMNS, QUANTILES, QUANTILE_LABELS, StreamingStats, compute_stats
+
+CATEGORIES = ['Music', 'Comedy', 'Gaming', 'News & Politics', 'Education', 'Sports']
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    views = rng.lognormal(11, 2, rows).round()
+    df = pd.DataFrame({
+        'views': views,
+        'likes': (views * rng.beta(2, 40, rows)).round(),
+        'dislikes': (views * rng.beta(1, 400, rows)).round(),
+        'comment_count': (views * rng.beta(1, 200, rows)).round(),
+        'category': rng.choice(CATEGORIES, rows),
+        'publish_time': pd.Timestamp('2017-11-01') + pd.to_timedelta(rng.integers(0, 200 * 86400, rows), unit='s'),
+    })
+    df.loc[df.index[::97], 'likes'] = np.nan
+    return df
+
+
+def rank_error(values, estimate, q):
+    # Distance between the estimate's normalized rank and the requested quantile
+    ordered = np.sort(values[~np.isnan(values)])
+    low = np.searchsorted(ordered, estimate, side='left') / len(ordered)
+    high = np.searchsorted(ordered, estimate, side='right') / len(ordered)
+    return 0.0 if low <= q <= high else min(abs(low - q), abs(high - q))
+
+
+def check_empty():
+    # A header-only upload, or one whose rows are all dropped, is summarized like describe() does:
+    # count 0 and NaN (NaT) everywhere else
+    df = make_frame(0)
+    expected = df.describe()
+    for summary in [compute_stats(df), StreamingStats().update(df).result()]:
+        assert summary.rows == 0
+        pd.testing.assert_frame_equal(summary.describe.astype(object), expected.astype(object), check_dtype=False)
+        assert summary.corr.isna().all().all()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--chunksize', type=int, default=50000)
+    parser.add_argument('--parts', type=int, default=4)
+    parser.add_argument('--k', type=int, default=200)
+    parser.add_argument('--max-rank-error', type=float, default=0.01)
+    args = parser.parse_args()
+
+    check_empty()
+    df = make_frame(args.rows)
+
+    start = time.perf_counter()
+    exact = compute_stats(df)
+    exact_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parts = [StreamingStats(k=args.k, seed=i) for i in range(args.parts)]
+    for i, offset in enumerate(range(0, len(df), args.chunksize)):
+        parts[i % args.parts].update(df.iloc[offset:offset + args.chunksize])
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+    streamed = merged.result()
+    stream_time = time.perf_counter() - start
+
+    expected = df.describe()
+    for column in CORR_COLUMNS:
+        for label in ['count', 'mean', 'std', 'min', 'max']:
+            assert np.isclose(streamed.describe.loc[label, column], expected.loc[label, column], rtol=1e-9), (column, label)
+    assert np.allclose(streamed.corr.to_numpy(), df[CORR_COLUMNS].dropna().corr().to_numpy(), rtol=1e-9)
+    means = df.groupby('category')['views'].mean()
+    assert np.allclose(streamed.category_means.set_index('category')['views'], means.loc[streamed.category_means['category']])
+    assert streamed.describe['publish_time']['min'] == df['publish_time'].min()
+
+    worst = 0.0
+    for column in CORR_COLUMNS:
+        values = df[column].to_numpy(dtype=np.float64)
+        for q, label in zip(QUANTILES, QUANTILE_LABELS):
+            worst = max(worst, rank_error(values, streamed.describe.loc[label, column], q))
+    assert worst <= args.max_rank_error, f"quantile rank error {worst:.4f} above {args.max_rank_error}"
+
+    retained = max(sum(len(items) for items in sketch.levels) for sketch in merged.sketches)
+    print(f"rows={args.rows} chunksize={args.chunksize} parts={args.parts} k={args.k}")
+    print(f"exact (compute_stats)   {exact_time:8.3f}s")
+    print(f"streaming + merge       {stream_time:8.3f}s")
+    print(f"worst quantile rank error {worst:.4%}, at most {retained} items kept per column")
+    print(exact.describe.loc[QUANTILE_LABELS, CORR_COLUMNS].to_string())
+    print(streamed.describe.loc[QUANTILE_LABELS, CORR_COLUMNS].to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# Tag questions answered from the strings every time (split per row, then count, group or search)
+# against tokenizing once into a TagIndex and answering from its integer ids.
+#   python -m benchmarks.bench_tags --rows 1000000
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import ensure_dataset
+from tags import TagIndex, normalize, piece_counts
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def split_rows(tags):
+    # A tag listed twice on a video counts once, as in the index
+    return [list(dict.fromkeys(t for t in (normalize(p) for p in s.split('|')) if t and t != '[none]'))
+            if isinstance(s, str) else [] for s in tags]
+
+
+def from_strings(df, tag):
+    # What a pandas-only pipeline would do for each question, rescanning the strings each time
+    counts = df['tags'].str.split('|').str.len()
+    lists = split_rows(df['tags'])
+    exploded = pd.DataFrame({'tag': lists, 'views': df['views'], 'category': df['category']}).explode('tag').dropna()
+    top = exploded.groupby('tag')['views'].agg(['size', 'mean']).sort_values('size', ascending=False).head(20)
+    per_category = exploded.groupby(['category', 'tag']).size()
+    subset = df[[tag in row for row in split_rows(df['tags'])]]
+    return counts, top, per_category, subset
+
+
+def from_index(df, tag):
+    counts = piece_counts(df['tags'])
+    index = TagIndex.build(df['tags'])
+    top = index.top(20, views=df['views'])
+    per_category = index.top_by_group(df['category'])
+    subset = df[index.mask(tag)]
+    return counts, top, per_category, subset
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'gyr-bench-data'))
+    args = parser.parse_args()
+
+    csv_path, _ = ensure_dataset(args.data_dir, args.rows)
+    df = pd.read_csv(csv_path, usecols=['tags', 'views', 'category_id']).rename(columns={'category_id': 'category'})
+    tag = Counter(t for row in split_rows(df['tags'].head(10000)) for t in row).most_common(1)[0][0]
+
+    (old_counts, old_top, _, old_subset), old_seconds = timed(lambda: from_strings(df, tag))
+    (new_counts, new_top, _, new_subset), new_seconds = timed(lambda: from_index(df, tag))
+    assert np.array_equal(old_counts.to_numpy(), new_counts.to_numpy(), equal_nan=True)
+    assert sorted(old_top['size']) == sorted(new_top['rows'])
+    assert old_subset.index.equals(new_subset.index)
+
+    index, build_seconds = timed(lambda: TagIndex.build(df['tags']))
+    print(f"rows={len(df)} distinct tags={len(index)} entries={len(index.indices)} subset on '{tag}'={len(new_subset)}")
+    print(f"from strings  {old_seconds:.3f}s")
+    print(f"tag index     {new_seconds:.3f}s  ({old_seconds / new_seconds:.1f}x), build alone {build_seconds:.3f}s")
+    for name, fn in [('top 20 + mean views', lambda: index.top(20, views=df['views'])),
+                     ('top 5 per category', lambda: index.top_by_group(df['category'])),
+                     ('15x15 co-occurrence', lambda: index.cooccurrence(15)),
+                     ('subset mask', lambda: index.mask(tag))]:
+        _, seconds = timed(fn)
+        print(f"  {name:<20} {seconds * 1000:8.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# Keyword discovery: an exact term table built from per-row token lists (explode + groupby, memory
+# growing with the corpus) against the hashed TermCounter fed chunk by chunk (memory fixed by the
+# hash width). Both score the same 2x2 table; the top terms should agree.
+#   python -m benchmarks.bench_terms --rows 1000000
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import ensure_dataset
+from terms import TermCounter, term_list, view_bands
+
+
+def exact(df, high_band):
+    codes, docs = TermCounter().documents(df)
+    text = docs[codes]
+    exploded = pd.DataFrame({'term': [term_list(doc) for doc in text],
+                             'high': view_bands(df['views']) >= high_band}).explode('term').dropna()
+    table = exploded.groupby('term')['high'].agg(['size', 'sum'])
+    return table[table['size'] >= 20].assign(share=lambda t: t['sum'] / t['size']).sort_values('share', ascending=False)
+
+
+def hashed(csv_path, chunksize):
+    counter = TermCounter()
+    for chunk in pd.read_csv(csv_path, usecols=['title', 'description', 'views'], chunksize=chunksize):
+        counter.update(chunk)
+    return counter
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'gyr-bench-data'))
+    args = parser.parse_args()
+
+    csv_path, _ = ensure_dataset(args.data_dir, args.rows)
+
+    start = time.perf_counter()
+    counter = hashed(csv_path, args.chunksize)
+    terms = counter.scores()
+    hashed_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df = pd.read_csv(csv_path, usecols=['title', 'description', 'views'])
+    table = exact(df, counter.high_band())
+    exact_seconds = time.perf_counter() - start
+
+    counter_bytes = counter.counts.nbytes + counter.rows.nbytes + counter.names.nbytes
+    print(f"rows={len(df)} distinct terms={len(table)} buckets={len(counter.names)}"
+          f" high views >= {terms.threshold:,.0f} ({terms.high_rows / terms.rows:.0%} of rows)")
+    print(f"exact per-row table   {exact_seconds:.3f}s")
+    print(f"hashed chunked        {hashed_seconds:.3f}s  ({exact_seconds / hashed_seconds:.1f}x),"
+          f" counter {counter_bytes / 2**20:.1f} MB whatever the rows")
+    # Bucket collisions can only add rows to a term, so compare the counts of the top terms
+    for term, rows, share in terms.top[['term', 'rows', 'high share']].head(5).itertuples(index=False):
+        print(f"  {term:<16} hashed rows={rows:>8} share={share:.3f}"
+              f"  exact rows={table.loc[term, 'size']:>8} share={table.loc[term, 'share']:.3f}")
+    assert np.all(terms.top['rows'].to_numpy() >= table.loc[terms.top['term'], 'size'].to_numpy())
+
+
+if __name__ == '__main__':
+    main()
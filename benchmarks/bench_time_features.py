@@ -0,0 +1,65 @@
+# Date parsing and time features: per-row pandas parsing and .dt accessors (how clean_data
+# used to work) against parsing each distinct value once and integer arithmetic on the epoch.
+#   python -m benchmarks.bench_time_features --rows 1000000
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import ensure_dataset
+from timefeatures import parse_dates, time_features
+
+
+def per_row(raw):
+    df = pd.DataFrame(index=raw.index)
+    df['trending_date'] = pd.to_datetime(raw['trending_date'], format='%y.%d.%m', errors='coerce')
+    df['publish_time'] = pd.to_datetime(raw['publish_time'], errors='coerce').dt.tz_localize(None)
+    to_trend = df['trending_date'] - df['publish_time']
+    df['days_to_trend'] = to_trend.dt.days
+    df['hours_to_trend'] = to_trend // pd.Timedelta(hours=1)
+    df['publish_hour'] = df['publish_time'].dt.hour
+    df['publish_weekday'] = df['publish_time'].dt.weekday
+    df['publish_month'] = df['publish_time'].dt.month
+    return df
+
+
+def cached(raw):
+    df = pd.DataFrame(index=raw.index)
+    df['trending_date'] = parse_dates(raw['trending_date'], format='%y.%d.%m')
+    df['publish_time'] = parse_dates(raw['publish_time'])
+    return time_features(df)
+
+
+def best_of(fn, raw, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(raw)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'gyr-bench-data'))
+    args = parser.parse_args()
+
+    csv_path, _ = ensure_dataset(args.data_dir, args.rows)
+    raw = pd.read_csv(csv_path, usecols=['trending_date', 'publish_time'])
+    print(f"rows={len(raw)} distinct trending_date={raw['trending_date'].nunique()}"
+          f" distinct publish_time={raw['publish_time'].nunique()}")
+
+    old_seconds, old = best_of(per_row, raw, args.repeat)
+    new_seconds, new = best_of(cached, raw, args.repeat)
+    for column in old.columns:
+        pd.testing.assert_series_equal(new[column].astype(old[column].dtype), old[column])
+    print(f"per-row parsing  {old_seconds:.3f}s")
+    print(f"distinct values  {new_seconds:.3f}s  ({old_seconds / new_seconds:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
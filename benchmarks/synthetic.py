@@ -0,0 +1,145 @@
+# Synthetic YouTube trending CSVs with the real column layout, at any scale.
+#   python -m benchmarks.synthetic 1000000 USvideos.csv --categories US_category_id.json
+# Videos trend for several days in a row with growing counts, as in the Kaggle exports: about
+# one row in eight is a new video. Text fields come from fixed pools so 10M rows stay cheap.
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['video_id', 'trending_date', 'title', 'channel_title', 'category_id', 'publish_time', 'tags',
+           'views', 'likes', 'dislikes', 'comment_count', 'thumbnail_link', 'comments_disabled',
+           'ratings_disabled', 'video_error_or_removed', 'description']
+CATEGORIES = {
+    1: 'Film & Animation', 2: 'Autos & Vehicles', 10: 'Music', 15: 'Pets & Animals', 17: 'Sports',
+    19: 'Travel & Events', 20: 'Gaming', 22: 'People & Blogs', 23: 'Comedy', 24: 'Entertainment',
+    25: 'News & Politics', 26: 'Howto & Style', 27: 'Education', 28: 'Science & Technology',
+}
+CATEGORY_WEIGHTS = [6, 1, 14, 1, 5, 1, 2, 9, 7, 25, 7, 7, 4, 5]
+WORDS = ['music', 'official', 'video', 'fun', 'funny', 'viral', 'challenge', 'tutorial', 'live', 'vlog',
+         'news', 'trailer', 'review', 'how', 'to', 'make', 'best', 'new', 'game', 'highlights', 'reaction',
+         'episode', 'season', 'interview', 'prank', 'DIY', 'recipe', 'cover', 'remix', 'lyrics']
+POOL_SIZE = 4096
+FIRST_DAY = pd.Timestamp('2017-11-14')
+TRENDING_DAYS = 205
+
+
+def text_pools(rng):
+    words = np.array(WORDS, dtype=object)
+    titles, tags, descriptions = [], [], []
+    for _ in range(POOL_SIZE):
+        title = ' '.join(rng.choice(words, rng.integers(2, 10))).title()
+        titles.append(title + rng.choice(['', ' (Official Video)', ' | Full Episode', ' - HD', ' ft. Someone']))
+        # Tags follow a heavy-tailed vocabulary; '[none]' is how untagged videos appear
+        n = rng.zipf(1.6) % 25
+        vocab = rng.zipf(1.3, n) % 5000
+        tags.append('|'.join(f'"{WORDS[v % len(WORDS)]} {v}"' for v in vocab) if n else '[none]')
+        body = ' '.join(rng.choice(words, rng.integers(5, 60)))
+        descriptions.append(
+            f"{body}\\n\\n<b>Subscribe</b> &amp; follow: https://www.youtube.com/channel/UC{rng.integers(1e9)}"
+            f"\\n<a href=\"https://www.instagram.com/x\">Instagram</a> {' '.join(rng.choice(words, 3))}")
+    descriptions[::17] = [np.nan] * len(descriptions[::17])
+    return np.array(titles, dtype=object), np.array(tags, dtype=object), np.array(descriptions, dtype=object)
+
+
+def video_table(rng, videos):
+    # Everything that stays fixed for a video across the days it trends
+    publish = FIRST_DAY.value + rng.integers(-3 * 86400, TRENDING_DAYS * 86400, videos) * 10**9
+    return {
+        'id': np.array([f'{i:011x}' for i in rng.integers(0, 16**11, videos)], dtype=object),
+        'category': rng.choice(list(CATEGORIES), videos, p=np.array(CATEGORY_WEIGHTS) / sum(CATEGORY_WEIGHTS)),
+        'channel': rng.integers(0, max(videos // 20, 1), videos),
+        'publish': publish,
+        'publish_text': pd.to_datetime(publish).strftime('%Y-%m-%dT%H:%M:%S.000Z').to_numpy(dtype=object),
+        'views': rng.lognormal(12.5, 1.8, videos),
+        'like_rate': rng.beta(2, 60, videos),
+        'dislike_rate': rng.beta(1, 600, videos),
+        'comment_rate': rng.beta(1, 250, videos),
+        'text': rng.integers(0, POOL_SIZE, videos),
+        'flags': rng.random(videos),
+    }
+
+
+def make_chunk(rng, table, pools, rows):
+    titles, tags, descriptions = pools
+    v = rng.integers(0, len(table['id']), rows)
+    # Days since publication at which the row was recorded, and the growth that comes with it
+    age = rng.geometric(0.35, rows)
+    first = (table['publish'][v] - FIRST_DAY.value) // (86400 * 10**9)
+    day = np.clip(first + age, 0, TRENDING_DAYS - 1)
+    day_text = pd.date_range(FIRST_DAY, periods=TRENDING_DAYS).strftime('%y.%d.%m').to_numpy(dtype=object)
+    views = np.round(table['views'][v] * (1 + 0.6 * np.log1p(age))).astype(np.int64)
+    flags = table['flags'][v]
+    comments_disabled = flags < 0.015
+    ratings_disabled = (flags > 0.99)
+    return pd.DataFrame({
+        'video_id': table['id'][v],
+        'trending_date': day_text[day],
+        'title': titles[table['text'][v]],
+        'channel_title': np.char.add('Channel ', table['channel'][v].astype(str)).astype(object),
+        'category_id': table['category'][v],
+        'publish_time': table['publish_text'][v],
+        'tags': tags[(table['text'][v] * 7) % POOL_SIZE],
+        'views': views,
+        'likes': np.where(ratings_disabled, 0, np.round(views * table['like_rate'][v])).astype(np.int64),
+        'dislikes': np.where(ratings_disabled, 0, np.round(views * table['dislike_rate'][v])).astype(np.int64),
+        'comment_count': np.where(comments_disabled, 0, np.round(views * table['comment_rate'][v])).astype(np.int64),
+        'thumbnail_link': 'https://i.ytimg.com/vi/' + table['id'][v] + '/default.jpg',
+        'comments_disabled': comments_disabled,
+        'ratings_disabled': ratings_disabled,
+        'video_error_or_removed': flags > 0.9995,
+        'description': descriptions[(table['text'][v] * 13) % POOL_SIZE],
+    }, columns=COLUMNS)
+
+
+def write_csv(path, rows, seed=0, chunk_rows=500000, encoding='utf-8'):
+    # Written a chunk at a time so the generator's memory does not grow with rows
+    rng = np.random.default_rng(seed)
+    pools = text_pools(rng)
+    table = video_table(rng, max(rows // 8, 1))
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding=encoding, newline='') as f:
+        for offset in range(0, rows, chunk_rows):
+            chunk = make_chunk(rng, table, pools, min(chunk_rows, rows - offset))
+            chunk.to_csv(f, index=False, header=offset == 0)
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_categories(path):
+    items = [{'kind': 'youtube#videoCategory', 'id': str(k), 'snippet': {'title': v, 'assignable': True}}
+             for k, v in CATEGORIES.items()]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'kind': 'youtube#videoCategoryListResponse', 'items': items}, f)
+    return path
+
+
+def ensure_dataset(directory, rows, seed=0):
+    # Reuse a generated file of the same size and seed across benchmark runs
+    os.makedirs(directory, exist_ok=True)
+    csv_path = os.path.join(directory, f'synthetic_{rows}_{seed}.csv')
+    cat_path = os.path.join(directory, 'synthetic_category_id.json')
+    if not os.path.exists(csv_path):
+        write_csv(csv_path, rows, seed)
+    if not os.path.exists(cat_path):
+        write_categories(cat_path)
+    return csv_path, cat_path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('rows', type=int)
+    parser.add_argument('output')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--encoding', default='utf-8')
+    parser.add_argument('--categories', help="also write a category JSON map here")
+    args = parser.parse_args()
+    write_csv(args.output, args.rows, args.seed, encoding=args.encoding)
+    if args.categories:
+        write_categories(args.categories)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+
+def file_digest(file_path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_key(digest, settings):
+    # Same bytes analyzed with different settings must not share an entry
+    blob = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(f"{digest}:{blob}".encode()).hexdigest()
+
+
+def entry_size(entry):
+    size = 0
+    for value in entry.values():
+        if isinstance(value, (bytes, str)):
+            size += len(value)
+        elif isinstance(value, (list, tuple)):
+            size += sum(len(v) for v in value)
+    return size
+
+
+class ResultCache:
+    # Two-tier LRU: a byte-bounded in-process dict in front of a byte-bounded directory of pickles.
+    # The disk tier is shared by every worker pointed at the same directory.
+
+    def __init__(self, max_bytes, directory=None, max_disk_bytes=0):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    def _remember(self, key, entry):
+        size = entry_size(entry)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= entry_size(self._entries.pop(key))
+        self._entries[key] = entry
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self._bytes -= entry_size(old)
+            self.evictions += 1
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            os.utime(path)  # mtime doubles as the disk tier's LRU clock
+            return entry
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _write_disk(self, key, entry):
+        if not self.directory or not self.max_disk_bytes:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._trim_disk()
+
+    def _disk_files(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.pkl'):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, name))
+        return files
+
+    def _trim_disk(self):
+        files = sorted(self._disk_files())
+        total = sum(size for _, size, _ in files)
+        for _, size, name in files:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+        if self.directory:
+            files = self._disk_files()
+            stats['disk_entries'] = len(files)
+            stats['disk_bytes'] = sum(size for _, size, _ in files)
+            stats['max_disk_bytes'] = self.max_disk_bytes
+        return stats
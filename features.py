@@ -0,0 +1,20 @@
+from keywords import KEYWORDS, get_matcher
+from tags import piece_counts
+
+
+def add_features(df, keep_keywords=True, keywords=None):
+    # Per-row features used by the plots; safe to run on a whole frame or on one chunk at a time
+    # Summed in float64: the counts of compacted chunks may be small integers that would wrap around
+    engaged = df['likes'].astype('float64') + df['dislikes'] + df['comment_count']
+    df['engagement_rate'] = engaged / df['views']
+    if 'title' in df:
+        df['title_length'] = df['title'].str.len()
+    if 'tags' in df:
+        df['tags_count'] = piece_counts(df['tags'])
+    if 'description' in df:
+        matcher = get_matcher(tuple(keywords or KEYWORDS))
+        masks = matcher.masks(df['description'])
+        if keep_keywords:
+            df['keywords'] = matcher.lists(masks)
+        df['keyword_count'] = matcher.counts(masks)
+    return df
@@ -0,0 +1,38 @@
+# gunicorn -c gunicorn.conf.py Project:app
+# The master imports the app and runs one tiny analysis before forking, so every worker starts
+# with pandas, matplotlib (font cache included), seaborn and reportlab already loaded and
+# shares those pages copy-on-write. Set GYR_WARM_UP=0 for lazy workers that only load the
+# analysis stack on their first upload.
+import gc
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get('GYR_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GYR_WEB_WORKERS', 2))
+timeout = int(os.environ.get('GYR_WEB_TIMEOUT', 120))
+preload_app = os.environ.get('GYR_WARM_UP', '1') == '1'
+
+# Workers share their metric counts in a directory of this server's own, so a scrape of any
+# worker reports all of them. It goes inside GYR_METRICS_DIR when that is set (the temp dir
+# otherwise), is read before the app is loaded, and is the only thing removed, at start and exit,
+# so counts from an earlier run are never added. The parent is kept aside for config reloads.
+metrics_parent = os.environ.setdefault('GYR_METRICS_PARENT', os.environ.get('GYR_METRICS_DIR') or tempfile.gettempdir())
+metrics_dir = os.environ['GYR_METRICS_DIR'] = os.path.join(metrics_parent, f'gyr-metrics-{os.getpid()}')
+shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+def when_ready(server):
+    # Runs once in the master, after the app is loaded and before the first worker is forked
+    if not preload_app:
+        return
+    import report
+    timings = report.warm_up()
+    # Objects created so far are never collected again, so the collector does not touch
+    # (and un-share) their pages in the workers
+    gc.freeze()
+    server.log.info("Warm-up done: %s", {k: round(v) for k, v in timings.items()})
+
+
+def on_exit(server):
+    shutil.rmtree(metrics_dir, ignore_errors=True)
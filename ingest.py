@@ -0,0 +1,300 @@
+import codecs
+import importlib.util
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from features import add_features
+from stats import StreamingStats
+from tags import TagIndex
+from timefeatures import parse_dates, time_features
+
+# Encoding and delimiter are decided from this many leading bytes, never from a full parse
+SNIFF_BYTES = 64 * 1024
+DELIMITERS = [',', ';', '\t', '|']
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+ENGINES = ['c', 'pyarrow']
+
+# Columns the analysis reads when streaming; the rest of a trending dump is never materialized
+CHUNK_COLUMNS = [
+    'video_id', 'trending_date', 'title', 'channel_title', 'category_id', 'publish_time', 'tags',
+    'views', 'likes', 'dislikes', 'comment_count', 'description',
+]
+CHUNK_DTYPES = {
+    'video_id': 'object',
+    'trending_date': 'object',
+    'title': 'object',
+    'channel_title': 'object',
+    'category_id': 'float64',
+    'publish_time': 'object',
+    'tags': 'object',
+    'views': 'float64',
+    'likes': 'float64',
+    'dislikes': 'float64',
+    'comment_count': 'float64',
+    'description': 'object',
+}
+# Heavy text columns are only kept long enough to derive their features
+TEXT_COLUMNS = ['title', 'tags', 'description']
+# What compact_frame removes or moves out of Python objects: the text above, links nothing
+# reads, and the per-row keyword lists (keyword_count carries what the plots use)
+HEAVY_COLUMNS = TEXT_COLUMNS + ['thumbnail_link', 'keywords']
+TEXT_STORAGE = ['drop', 'arrow']
+# String columns with fewer distinct values than this share of rows become categoricals
+CATEGORICAL_RATIO = 0.5
+# Object values sized per column when reporting frame memory
+SIZE_SAMPLE = 10000
+
+
+def load_categories(cat_path):
+    cat_dict = {}
+    if cat_path and os.path.exists(cat_path):
+        try:
+            with open(cat_path, encoding='utf-8') as f:
+                data = json.load(f)
+            cat_dict = {int(item['id']): item['snippet']['title'] for item in data['items']}
+        except:
+            pass
+    return cat_dict
+
+
+def clean_data(df, cat_dict):
+    # Map categories if available
+    if cat_dict:
+        df['category'] = df['category_id'].map(cat_dict)
+
+    # Each distinct date string is parsed once; the derived time features are integer arithmetic
+    df['trending_date'] = parse_dates(df['trending_date'], format='%y.%d.%m')
+    df['publish_time'] = parse_dates(df['publish_time'])
+    time_features(df)
+    df.dropna(subset=['views', 'likes', 'dislikes', 'comment_count'], inplace=True)
+    # A header-only file reads every column as object; the counts keep their place in the summary
+    if not len(df):
+        for column in ['views', 'likes', 'dislikes', 'comment_count']:
+            df[column] = df[column].astype('float64')
+    return df
+
+
+def open_source(file_path):
+    # A path, or an object whose open() returns a binary stream (e.g. an upload still arriving)
+    return file_path.open() if hasattr(file_path, 'open') else open(file_path, 'rb')
+
+
+@contextmanager
+def csv_source(file_path):
+    # pandas opens plain paths itself; anything else is handed over as an open stream
+    if isinstance(file_path, (str, os.PathLike)):
+        yield file_path
+    else:
+        with file_path.open() as f:
+            yield f
+
+
+def sniff_csv(file_path, nbytes=SNIFF_BYTES):
+    with open_source(file_path) as f:
+        head = f.read(nbytes)
+
+    encoding, bom = None, False
+    for mark, name in BOMS:
+        if head.startswith(mark):
+            encoding, bom = name, True
+            break
+    if encoding is None:
+        # Incremental decode so a multi-byte character cut off at the prefix boundary is not an error
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+            encoding = 'utf-8'
+        except UnicodeDecodeError:
+            encoding = 'latin1'
+
+    # Pick the delimiter from the header row only; tags are '|'-joined inside the data rows
+    text = head.decode(encoding, errors='replace')
+    header = text.splitlines()[0] if text else ''
+    delimiter = max(DELIMITERS, key=header.count)
+    return {'encoding': encoding, 'bom': bom, 'delimiter': delimiter}
+
+
+def resolve_engine(engine):
+    if engine == 'auto':
+        return 'pyarrow' if importlib.util.find_spec('pyarrow') else 'c'
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown CSV engine: {engine}")
+    return engine
+
+
+def ingest_report(file_path, engine):
+    start = time.perf_counter()
+    report = sniff_csv(file_path)
+    report['engine'] = engine
+    report['sniff_ms'] = (time.perf_counter() - start) * 1000
+    report['reparsed'] = False
+    return report
+
+
+def read_csv(file_path, engine='c'):
+    # Detect once from the prefix, then parse the file exactly once
+    report = ingest_report(file_path, resolve_engine(engine))
+
+    start = time.perf_counter()
+    try:
+        with csv_source(file_path) as source:
+            df = pd.read_csv(source, encoding=report['encoding'], sep=report['delimiter'], engine=report['engine'])
+    except UnicodeDecodeError:
+        # The prefix decoded as UTF-8 but a later byte did not; latin1 accepts every byte
+        report['encoding'], report['reparsed'] = 'latin1', True
+        with csv_source(file_path) as source:
+            df = pd.read_csv(source, encoding='latin1', sep=report['delimiter'], engine=report['engine'])
+    report['parse_ms'] = (time.perf_counter() - start) * 1000
+    return df, report
+
+
+def iter_chunks(file_path, chunksize, encoding='utf-8', delimiter=','):
+    with csv_source(file_path) as source, pd.read_csv(
+        source,
+        encoding=encoding,
+        sep=delimiter,
+        usecols=lambda c: c in CHUNK_COLUMNS,
+        dtype=CHUNK_DTYPES,
+        chunksize=chunksize,
+    ) as reader:
+        yield from reader
+
+
+def compact_chunk(chunk, cat_dict, keywords=None, tag_parts=None, terms=None):
+    # Clean one chunk and reduce it to the columns the plots and the summary need. Pass a list
+    # as tag_parts to collect each chunk's TagIndex, and a TermCounter as terms to count its
+    # title and description terms, before the text is dropped.
+    chunk = clean_data(chunk, cat_dict)
+    add_features(chunk, keep_keywords=False, keywords=keywords)
+    if tag_parts is not None and 'tags' in chunk:
+        tag_parts.append(TagIndex.build(chunk['tags']))
+    if terms is not None:
+        terms.update(chunk)
+    chunk = chunk.drop(columns=[c for c in TEXT_COLUMNS if c in chunk])
+    # Every remaining string column (video ids, channels, category names) becomes codes here,
+    # so the rows kept until the last chunk is read hold no Python strings
+    for column in chunk.columns:
+        if chunk[column].dtype == object:
+            chunk[column] = chunk[column].astype('category')
+    compact_frame(chunk)
+    return chunk
+
+
+def concat_chunks(parts):
+    # pd.concat turns categoricals with different categories back into objects; their categories
+    # are unioned instead. Counts downcast differently per chunk widen to the largest type.
+    index = parts[0].index.append([part.index for part in parts[1:]])
+    columns = {}
+    for column in parts[0].columns:
+        values = [part[column] for part in parts]
+        if any(isinstance(v.dtype, pd.CategoricalDtype) for v in values):
+            # A chunk whose labels were all missing (e.g. unmapped categories) read as float NaN
+            values = [v if isinstance(v.dtype, pd.CategoricalDtype) else v.astype(object).astype('category')
+                      for v in values]
+            columns[column] = pd.Series(union_categoricals(values, sort_categories=True), index=index)
+        else:
+            columns[column] = pd.concat(values)
+    return pd.DataFrame(columns, index=index, copy=False)
+
+
+def frame_bytes(df, sample=SIZE_SAMPLE):
+    # Like memory_usage(deep=True), but the strings of an object column are sized from an even
+    # sample of its values; a full deep scan of a million-row text frame takes seconds
+    total = int(df.memory_usage(index=True, deep=False).sum())
+    for column in df.columns:
+        values = df[column].to_numpy() if df[column].dtype == object else None
+        if values is not None and len(values):
+            step = max(len(values) // sample, 1)
+            sizes = [sys.getsizeof(v) for v in values[::step]]
+            total += int(sum(sizes) * len(values) / len(sizes))
+    return total
+
+
+def whole_numbers(values):
+    # Float column that only holds finite whole numbers, e.g. counts read next to missing rows
+    return bool(np.isfinite(values).all() and (values == np.floor(values)).all())
+
+
+def compact_frame(df, text='drop'):
+    # In place, after the features are derived: categoricals for repetitive strings, the smallest
+    # integer type that holds every count, and the free text dropped or moved to Arrow strings.
+    # Float features (e.g. engagement_rate) are left alone so the summary does not change.
+    if text not in TEXT_STORAGE:
+        raise ValueError(f"Unknown text storage: {text}")
+    report = {'bytes_before': frame_bytes(df)}
+
+    heavy = [c for c in HEAVY_COLUMNS if c in df]
+    if text == 'arrow' and importlib.util.find_spec('pyarrow'):
+        for column in heavy:
+            if column != 'keywords' and df[column].dtype == object:
+                df[column] = df[column].astype('string[pyarrow]')
+        heavy = [c for c in heavy if c == 'keywords']
+    df.drop(columns=heavy, inplace=True)
+
+    for column in df.columns:
+        values = df[column]
+        if values.dtype == object:
+            codes, uniques = pd.factorize(values, sort=True)
+            if len(uniques) < len(values) * CATEGORICAL_RATIO:
+                df[column] = pd.Categorical.from_codes(codes, uniques)
+        elif values.dtype.kind in 'iu':
+            df[column] = pd.to_numeric(values, downcast='integer' if values.dtype.kind == 'i' else 'unsigned')
+        elif values.dtype.kind == 'f' and len(values) and whole_numbers(values.to_numpy()):
+            df[column] = pd.to_numeric(values.astype(np.int64), downcast='integer')
+
+    report['bytes_after'] = frame_bytes(df)
+    return report
+
+
+def load_chunked(file_path, cat_dict, chunksize, keywords=None, tag_parts=None, terms=None):
+    # Peak memory is one raw chunk plus the compacted rows seen so far: numbers in their smallest
+    # type and strings as category codes. stream_stats keeps no rows at all.
+    # Chunked reads always use the C engine, the only one that supports chunksize.
+    report = ingest_report(file_path, 'c')
+
+    start = time.perf_counter()
+    try:
+        parts = [compact_chunk(chunk, cat_dict, keywords, tag_parts, terms)
+                 for chunk in iter_chunks(file_path, chunksize, report['encoding'], report['delimiter'])]
+    except UnicodeDecodeError:
+        report['encoding'], report['reparsed'] = 'latin1', True
+        if tag_parts is not None:
+            del tag_parts[:]
+        if terms is not None:
+            terms.reset()
+        parts = [compact_chunk(chunk, cat_dict, keywords, tag_parts, terms)
+                 for chunk in iter_chunks(file_path, chunksize, 'latin1', report['delimiter'])]
+    report['parse_ms'] = (time.perf_counter() - start) * 1000
+
+    df = concat_chunks(parts)
+    df.attrs['ingest'] = report
+    return df
+
+
+def stream_stats(file_path, cat_dict, chunksize, keywords=None, stats=None):
+    # Summary of a file without keeping any of its rows: every cleaned chunk is folded into
+    # StreamingStats and dropped. Pass an existing accumulator to add this file to it.
+    report = ingest_report(file_path, 'c')
+    start = time.perf_counter()
+    try:
+        partial = StreamingStats()
+        for chunk in iter_chunks(file_path, chunksize, report['encoding'], report['delimiter']):
+            partial.update(compact_chunk(chunk, cat_dict, keywords))
+    except UnicodeDecodeError:
+        report['encoding'], report['reparsed'] = 'latin1', True
+        partial = StreamingStats()
+        for chunk in iter_chunks(file_path, chunksize, 'latin1', report['delimiter']):
+            partial.update(compact_chunk(chunk, cat_dict, keywords))
+    report['parse_ms'] = (time.perf_counter() - start) * 1000
+    stats = partial if stats is None else stats.merge(partial)
+    return stats, report
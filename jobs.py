@@ -0,0 +1,187 @@
+import fcntl
+import json
+import os
+import pickle
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from artifacts import atomic_write
+
+# What run_job returns for a job that stepped aside; its status belongs to whoever cancelled it
+CANCELLED = 'cancelled'
+
+
+class JobCancelled(Exception):
+    # Raised inside a job whose work is no longer wanted, e.g. an upload that turned out to be cached
+    pass
+
+
+def write_json(path, data):
+    atomic_write(path, json.dumps(data).encode('utf-8'))
+
+
+def write_pickle(path, data):
+    atomic_write(path, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+@contextmanager
+def status_lock(job_dir):
+    # Serializes changes to a job's status across the web and pool processes
+    with open(os.path.join(job_dir, 'status.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def update_status(job_dir, states=None, owner=None, **changes):
+    # Applies changes if the job is in one of states (any state when None) and, given an owner, still
+    # belongs to that submission, as one step; returns the new status, or None when the job had moved on
+    status_path = os.path.join(job_dir, 'status.json')
+    with status_lock(job_dir):
+        with open(status_path, encoding='utf-8') as f:
+            status = json.load(f)
+        if states is not None and status.get('state') not in states:
+            return None
+        if owner is not None and status.get('run') != owner:
+            return None
+        status.update(changes)
+        write_json(status_path, status)
+    return status
+
+
+def run_job(job_dir, run, fn, args):
+    # Runs inside the pool worker; state goes to disk so any web worker can answer a poll.
+    # Only the latest submission of a queued job starts, and only while it is still running does
+    # it record its end: a job completed by someone else meanwhile (e.g. from the cache), or
+    # requeued for other work, keeps that status.
+    if update_status(job_dir, ('queued',), owner=run, state='running', started=time.time()) is None:
+        return CANCELLED
+    try:
+        result = fn(*args)
+        write_pickle(os.path.join(job_dir, 'result.pkl'), result)
+        changes = {'state': 'done', 'finished': time.time()}
+    except JobCancelled:
+        return CANCELLED
+    except Exception as e:
+        traceback.print_exc()
+        changes = {'state': 'failed', 'finished': time.time(), 'error': str(e)}
+    if update_status(job_dir, ('running',), owner=run, **changes) is None:
+        return CANCELLED
+
+
+class JobManager:
+    # A bounded pool of analysis workers. Job state lives in the job's artifact directory, so the
+    # web process that accepted an upload does not have to be the one that answers its polls.
+
+    def __init__(self, store, max_workers, max_pending, executor='process', on_done=None):
+        self.store = store
+        self.max_pending = max_pending
+        # Called in this process as on_done(job_id, status) once a submitted job has finished
+        self.on_done = on_done
+        self.max_workers = max_workers
+        self.executor = executor
+        # Started by the first submit, in the process that submits: a pool built in a pre-fork
+        # master would hand every forked web worker the same call queue and wakeup pipe
+        self._executor = None
+        self._owner = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def job_dir(self, job_id):
+        return self.store.job_dir(job_id)
+
+    def create(self):
+        job_id = self.store.create()
+        job_dir = self.job_dir(job_id)
+        write_json(os.path.join(job_dir, 'status.json'), {'id': job_id, 'state': 'queued', 'submitted': time.time()})
+        return job_id
+
+    def busy(self):
+        with self._lock:
+            return self._pending >= self.max_pending
+
+    def spare(self):
+        # Whether a worker would still be free for other jobs after one more starts
+        with self._lock:
+            return self._pending + 1 < self.max_workers
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None or self._owner != os.getpid():
+                pool = ProcessPoolExecutor if self.executor == 'process' else ThreadPoolExecutor
+                self._executor = pool(max_workers=self.max_workers)
+                self._owner = os.getpid()
+            return self._executor
+
+    def submit(self, job_id, fn, *args):
+        executor = self._pool()
+        # The job belongs to this submission from now on; an earlier one can no longer start or end it
+        run = uuid.uuid4().hex
+        update_status(self.job_dir(job_id), ('queued',), run=run)
+        with self._lock:
+            self._pending += 1
+        try:
+            future = executor.submit(run_job, self.job_dir(job_id), run, fn, args)
+        except Exception as e:
+            with self._lock:
+                self._pending -= 1
+            if isinstance(e, BrokenProcessPool):
+                self._discard(executor)
+            raise
+        future.add_done_callback(partial(self._finished, job_id, run, executor))
+
+    def _discard(self, executor):
+        # A worker that died (e.g. killed for memory) breaks the whole pool; the next submit
+        # starts a fresh one
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def requeue(self, job_id):
+        # Takes a job back from a submission whose work was cancelled (e.g. a speculative parse of
+        # an upload that turned out to have more files), so the job can be submitted again
+        update_status(self.job_dir(job_id), ('queued', 'running'), state='queued', run=None)
+
+    def _finished(self, job_id, run, executor, future):
+        with self._lock:
+            self._pending -= 1
+        if isinstance(future.exception(), BrokenProcessPool):
+            self._discard(executor)
+        # run_job records its own failures; this only fires if the worker itself died
+        if future.exception() is not None:
+            update_status(self.job_dir(job_id), ('queued', 'running'), owner=run, state='failed', finished=time.time(),
+                          error=str(future.exception()))
+        elif future.result() == CANCELLED:
+            return
+        if self.on_done is not None:
+            self.on_done(job_id, self.status(job_id) or {'id': job_id, 'state': 'failed'})
+
+    def complete(self, job_id, result):
+        # Record a result that was available without running anything (e.g. a cache hit)
+        job_dir = self.job_dir(job_id)
+        write_pickle(os.path.join(job_dir, 'result.pkl'), result)
+        update_status(job_dir, state='done', finished=time.time())
+
+    def fail(self, job_id, error):
+        # Record a job that failed before any work was submitted (e.g. a rejected upload)
+        update_status(self.job_dir(job_id), state='failed', finished=time.time(), error=error)
+
+    def status(self, job_id):
+        job_dir = self.job_dir(job_id)
+        if job_dir is None:
+            return None
+        try:
+            with open(os.path.join(job_dir, 'status.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def result(self, job_id):
+        with open(os.path.join(self.job_dir(job_id), 'result.pkl'), 'rb') as f:
+            return pickle.load(f)
@@ -0,0 +1,79 @@
+import html
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+KEYWORDS = ['music', 'fun', 'viral', 'challenge', 'tutorial']
+
+# Tags as html.parser recognizes them; a bare '<' in prose is left alone
+TAG_RE = re.compile(r'<[A-Za-z/!?][^>]*>')
+
+
+def extract_keywords(description, keywords=KEYWORDS):
+    # Reference implementation: one full parse tree per description
+    from bs4 import BeautifulSoup  # only benchmarks compare against it; too slow to import eagerly
+    if pd.isna(description):
+        return []
+    soup = BeautifulSoup(description, 'html.parser')
+    text = soup.get_text()
+    return [kw for kw in keywords if kw.lower() in text.lower()]
+
+
+def strip_markup(descriptions):
+    text = descriptions.str.replace(TAG_RE, '', regex=True)
+    # Entities only matter where there is an '&'; unescape just those rows
+    has_entity = text.str.contains('&', regex=False, na=False)
+    if has_entity.any():
+        text[has_entity] = text[has_entity].map(html.unescape)
+    return text
+
+
+class KeywordMatcher:
+    # Substring matching of a keyword list in one regex scan per description.
+    # The alternation sits in a lookahead, so it is tried at every offset. At each offset it
+    # reports only the longest keyword, which is why every match also credits the other
+    # keywords it contains (e.g. 'fun' inside 'funny').
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        if len(self.keywords) > 63:
+            raise ValueError("At most 63 keywords can be matched at once")
+        lowered = [kw.lower() for kw in self.keywords]
+        self.closure = {}
+        for kw in set(lowered):
+            mask = 0
+            for i, other in enumerate(lowered):
+                if other in kw:
+                    mask |= 1 << i
+            self.closure[kw] = mask
+        alternatives = sorted(set(lowered), key=len, reverse=True)
+        self.pattern = re.compile('(?=(' + '|'.join(re.escape(kw) for kw in alternatives) + '))') if alternatives else None
+
+    def masks(self, descriptions):
+        # Bit i of a row's mask is set when keyword i occurs in its description text
+        masks = np.zeros(len(descriptions), dtype=np.int64)
+        if self.pattern is None:
+            return masks
+        descriptions = descriptions.reset_index(drop=True)
+        if not pd.api.types.is_string_dtype(descriptions):
+            descriptions = descriptions.astype(object)  # an all-empty column is read as float NaN
+        text = strip_markup(descriptions).str.lower()
+        found = text.str.findall(self.pattern).explode().dropna()
+        if len(found):
+            np.bitwise_or.at(masks, found.index.to_numpy(), found.map(self.closure).to_numpy(dtype=np.int64))
+        return masks
+
+    def counts(self, masks):
+        return np.bitwise_count(masks).astype(np.int64)
+
+    def lists(self, masks):
+        # Matched keywords in list order, built once per distinct mask
+        lookup = {m: [kw for i, kw in enumerate(self.keywords) if m >> i & 1] for m in np.unique(masks).tolist()}
+        return [lookup[m] for m in masks.tolist()]
+
+
+@lru_cache(maxsize=16)
+def get_matcher(keywords):
+    return KeywordMatcher(keywords)
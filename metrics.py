@@ -0,0 +1,256 @@
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from artifacts import atomic_write
+
+# Histogram upper bounds in seconds: a cached page takes milliseconds, a 10M-row parse minutes
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def peak_rss_bytes():
+    # High-water mark of this process: since the last reset_peak_rss where Linux allows one
+    # (VmHWM), otherwise over its lifetime (ru_maxrss, kilobytes on Linux and bytes on macOS)
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def reset_peak_rss():
+    # Restarts VmHWM at the current RSS; elsewhere peaks stay lifetime ones
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='ascii') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+# Peak of the work measured so far in the innermost open measure_peak of this process
+_enclosing_peak = 0
+
+
+@contextmanager
+def measure_peak():
+    # Peak RSS of the enclosed work alone, not of the biggest job this long-lived worker ever ran.
+    # The high-water mark is restarted for it, and an enclosing measurement still sees the peak
+    # of everything inside it. The yielded dict gets 'bytes' on exit.
+    global _enclosing_peak
+    saved = max(_enclosing_peak, peak_rss_bytes())
+    reset_peak_rss()
+    _enclosing_peak = 0
+    measured = {}
+    try:
+        yield measured
+    finally:
+        measured['bytes'] = max(_enclosing_peak, peak_rss_bytes())
+        _enclosing_peak = max(saved, measured['bytes'])
+
+
+def timed_call(fn, args):
+    # Runs one unit of work (e.g. a figure in a render pool) and reports its cost with the result
+    with measure_peak() as peak:
+        start = time.perf_counter()
+        result = fn(*args)
+        seconds = time.perf_counter() - start
+    return result, seconds, peak['bytes']
+
+
+def server_timing(entries):
+    # Server-Timing header value from (name, seconds) pairs
+    return ', '.join(f'{name};dur={seconds * 1000:.1f}' for name, seconds in entries)
+
+
+class StageTimer:
+    # Wall time, peak RSS and row count of every stage of one analysis, in the order they ran.
+    # Entries are plain dicts so they travel back from a job worker inside its result.
+
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        # The yielded dict can take extra fields, e.g. entry['rows'] = len(df)
+        entry = {'stage': name}
+        start = time.perf_counter()
+        try:
+            with measure_peak() as peak:
+                yield entry
+        finally:
+            entry['seconds'] = time.perf_counter() - start
+            entry['peak_rss_bytes'] = peak['bytes']
+            self.stages.append(entry)
+
+    def record(self, name, seconds, peak=None, rows=None):
+        entry = {'stage': name, 'seconds': seconds, 'peak_rss_bytes': peak or peak_rss_bytes()}
+        if rows is not None:
+            entry['rows'] = rows
+        self.stages.append(entry)
+
+    def extend(self, stages):
+        self.stages.extend(stages)
+
+    def total(self, *names):
+        return sum(e['seconds'] for e in self.stages if e['stage'] in names)
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+def format_labels(labels):
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}' if labels else ''
+
+
+class MetricsRegistry:
+    # Metrics in the Prometheus text format. A scrape of a pre-fork server reaches one arbitrary
+    # worker, so with a directory every worker also writes its counters and histograms to
+    # <directory>/<pid>.json (at most every flush_interval seconds after a change) and render()
+    # sums all the files. Gauges always describe the worker that answers the scrape. Without a
+    # directory everything stays in this process.
+
+    def __init__(self, buckets=DURATION_BUCKETS, directory=None, flush_interval=1.0):
+        self.buckets = buckets
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flushed = 0.0
+        self._timer = None
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._counters = {}    # (name, labels) -> value
+        self._gauges = {}      # (name, labels) -> value
+        self._help = {}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram(self.buckets)
+            self._histograms[key].observe(value)
+        self._changed()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+        self._changed()
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe_stages(self, stages):
+        for entry in stages:
+            self.observe('gyr_stage_duration_seconds', entry['seconds'], stage=entry['stage'])
+            self.set('gyr_stage_peak_rss_bytes', entry['peak_rss_bytes'], stage=entry['stage'])
+            if 'rows' in entry:
+                self.inc('gyr_stage_rows_total', entry['rows'], stage=entry['stage'])
+            if 'bytes_after' in entry:
+                self.set('gyr_stage_frame_bytes', entry['bytes_after'], stage=entry['stage'])
+
+    def _changed(self):
+        # Shares a change soon without writing the file on every request
+        if not self.directory:
+            return
+        with self._lock:
+            if self._timer is not None:
+                return
+            due = self._flushed + self.flush_interval - time.monotonic()
+            if due > 0:
+                self._timer = threading.Timer(due, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+                return
+        self.flush()
+
+    def flush(self):
+        # This worker's counters and histograms, written whole; the file name is taken now, so a
+        # registry created before a fork writes one file per worker
+        with self._flush_lock:
+            with self._lock:
+                self._timer = None
+                self._flushed = time.monotonic()
+                snapshot = {
+                    'counters': [[name, labels, value] for (name, labels), value in self._counters.items()],
+                    'histograms': [[name, labels, hist.counts, hist.sum, hist.count]
+                                   for (name, labels), hist in self._histograms.items()],
+                }
+            path = os.path.join(self.directory, f'{os.getpid()}.json')
+            atomic_write(path, json.dumps(snapshot).encode('utf-8'))
+
+    def _shared(self):
+        # Counters and histograms summed over every worker's file, this one's included
+        self.flush()
+        counters, histograms = {}, {}
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue  # a worker's file from an older layout, or unreadable
+            for metric, labels, value in snapshot['counters']:
+                key = (metric, tuple(tuple(pair) for pair in labels))
+                counters[key] = counters.get(key, 0) + value
+            for metric, labels, counts, total, count in snapshot['histograms']:
+                key = (metric, tuple(tuple(pair) for pair in labels))
+                hist = histograms.setdefault(key, Histogram(self.buckets))
+                hist.counts = [a + b for a, b in zip(hist.counts, counts)]
+                hist.sum += total
+                hist.count += count
+        return counters, histograms
+
+    def render(self):
+        lines = []
+        counters, histograms = self._shared() if self.directory else (None, None)
+        with self._lock:
+            families = {}
+            for (name, labels), hist in (histograms if histograms is not None else self._histograms).items():
+                families.setdefault(name, []).append(('histogram', labels, hist))
+            for (name, labels), value in (counters if counters is not None else self._counters).items():
+                families.setdefault(name, []).append(('counter', labels, value))
+            for (name, labels), value in self._gauges.items():
+                families.setdefault(name, []).append(('gauge', labels, value))
+
+            for name in sorted(families):
+                kind, text = self._help.get(name, (families[name][0][0], name))
+                lines.append(f'# HELP {name} {text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for _, labels, value in sorted(families[name], key=lambda f: f[1]):
+                    if isinstance(value, Histogram):
+                        for bound, count in zip(value.buckets, value.counts):
+                            lines.append(f'{name}_bucket{format_labels(labels + (("le", bound),))} {count}')
+                        lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {value.count}')
+                        lines.append(f'{name}_sum{format_labels(labels)} {value.sum}')
+                        lines.append(f'{name}_count{format_labels(labels)} {value.count}')
+                    else:
+                        lines.append(f'{name}{format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,178 @@
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import seaborn as sns
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+
+from metrics import timed_call
+from stats import WEEKDAYS
+
+# Every figure is drawn on its own Figure object instead of the global pyplot state,
+# so figures can be rendered concurrently in a pool
+
+
+def figure_to_png(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    return buf.getvalue()
+
+
+def correlation_plot(corr):
+    fig = Figure()
+    ax = fig.subplots()
+    sns.heatmap(corr, annot=True, cmap='coolwarm', ax=ax)
+    return figure_to_png(fig)
+
+
+def category_plot(means):
+    fig = Figure(figsize=(12,6))
+    ax = fig.subplots()
+    sns.barplot(x='category', y='views', data=means, ax=ax)
+    for label in ax.get_xticklabels():
+        label.set_rotation(45)
+    return figure_to_png(fig)
+
+
+def region_plot(regions):
+    # Mean and median views side by side for every region of a multi-region report
+    fig = Figure(figsize=(10,5))
+    ax = fig.subplots()
+    regions[['mean views', 'median views']].plot.bar(ax=ax, rot=0)
+    ax.set_xlabel('region')
+    ax.set_ylabel('views')
+    return figure_to_png(fig)
+
+
+def category_region_plot(means):
+    fig = Figure(figsize=(12,8))
+    ax = fig.subplots()
+    sns.heatmap(means, cmap='viridis', ax=ax, cbar_kws={'label': 'mean views'})
+    return figure_to_png(fig)
+
+
+def publish_timing_plot(timing):
+    # Mean views and how many were published, per weekday and hour
+    fig = Figure(figsize=(12,7))
+    axes = fig.subplots(2, 1, sharex=True)
+    panels = [(timing.means(), 'mean views'), (timing.grid(), timing.unit)]
+    for ax, (grid, label) in zip(axes, panels):
+        image = ax.imshow(np.ma.masked_invalid(np.where(timing.grid() > 0, grid, np.nan)), aspect='auto', cmap='viridis')
+        fig.colorbar(image, ax=ax, label=label)
+        ax.set_yticks(range(len(WEEKDAYS)), WEEKDAYS)
+    axes[0].set_title('Publish timing')
+    axes[1].set_xticks(range(24))
+    axes[1].set_xlabel('publish hour (UTC)')
+    return figure_to_png(fig)
+
+
+def top_tags_plot(tags):
+    # Mean views of the most common tags (with how many carry each) and how the top tags pair up
+    fig = Figure(figsize=(14,7))
+    left, right = fig.subplots(1, 2, gridspec_kw={'width_ratios': [1, 1.2]})
+    top = tags.top[::-1]
+    left.barh([f"{tag} ({rows})" for tag, rows in zip(top['tag'], top['rows'])], top['mean views'])
+    left.set_xlabel('mean views')
+    left.set_title(f"Top tags ({tags.vocabulary} distinct)")
+    sns.heatmap(tags.cooccurrence, ax=right, cmap='viridis', square=True, cbar_kws={'label': 'rows with both'})
+    right.set_title('Tag co-occurrence')
+    fig.tight_layout()
+    return figure_to_png(fig)
+
+
+def draw_scatter(fig, ax, data, x, y):
+    sns.scatterplot(x=x, y=y, data=data, ax=ax)
+
+
+def scatter_plot(data, x, y):
+    fig = Figure()
+    draw_scatter(fig, fig.subplots(), data, x, y)
+    return figure_to_png(fig)
+
+
+def axis_edges(values, bins):
+    # Integer-valued axes with a short range (tags_count, keyword_count) get one bin per value
+    if len(values) == 0:
+        return bins
+    low, high = values.min(), values.max()
+    if high - low < bins and np.array_equal(values, np.round(values)):
+        return np.arange(low - 0.5, high + 1.5)
+    return bins
+
+
+def bin_scatter(data, x, y, bins):
+    # 2-D histogram of the finite points: the only O(rows) step of a binned scatter
+    xs = data[x].to_numpy(dtype=np.float64, na_value=np.nan)
+    ys = data[y].to_numpy(dtype=np.float64, na_value=np.nan)
+    keep = np.isfinite(xs) & np.isfinite(ys)
+    xs, ys = xs[keep], ys[keep]
+    return np.histogram2d(xs, ys, bins=[axis_edges(xs, bins), axis_edges(ys, bins)])
+
+
+def draw_binned_scatter(fig, ax, binned, x, y):
+    # Draws bin counts, so its cost depends on the number of bins and not on the rows behind them
+    counts, x_edges, y_edges = binned
+    mesh = ax.pcolormesh(x_edges, y_edges, np.ma.masked_equal(counts.T, 0), cmap='viridis',
+                         norm=LogNorm(vmin=1, vmax=max(counts.max(), 1)))
+    fig.colorbar(mesh, ax=ax, label='rows')
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+
+
+def binned_scatter_plot(binned, x, y):
+    fig = Figure()
+    draw_binned_scatter(fig, fig.subplots(), binned, x, y)
+    return figure_to_png(fig)
+
+
+def scatter_task(data, x, y, max_rows=None, bins=200):
+    # Above max_rows the points are binned here, and only the bin counts reach the renderer
+    if max_rows and len(data) > max_rows:
+        return binned_scatter_plot, (bin_scatter(data, x, y, bins), x, y)
+    return scatter_plot, (data, x, y)
+
+
+def keyword_plot(binned, scatter_args, terms):
+    # The keyword scatter, with the terms this dataset's high-view rows over-use beside it
+    fig = Figure(figsize=(14,6))
+    left, right = fig.subplots(1, 2)
+    (draw_binned_scatter if binned else draw_scatter)(fig, left, *scatter_args)
+    top = terms.top[::-1]
+    right.barh(top['term'], top['lift'])
+    right.axvline(1, color='grey', linestyle='--')
+    right.set_xlabel(f"lift: share above {terms.threshold:,.0f} views vs {terms.high_rows / max(terms.rows, 1):.0%} overall")
+    right.set_title('Terms associated with high views')
+    fig.tight_layout()
+    return figure_to_png(fig)
+
+
+def keyword_task(data, terms, max_rows=None, bins=200):
+    # Falls back to the plain keyword scatter when no terms were discovered
+    fn, args = scatter_task(data, 'keyword_count', 'views', max_rows, bins)
+    if terms is None or not len(terms.top):
+        return fn, args
+    return keyword_plot, (fn is binned_scatter_plot, args, terms)
+
+
+def histogram_plot(values):
+    fig = Figure()
+    ax = fig.subplots()
+    sns.histplot(values, ax=ax)
+    return figure_to_png(fig)
+
+
+def render_plots(tasks, workers=None, timer=None):
+    # tasks is a list of (plot function, args); results keep the task order.
+    # The pool lives only for one report so no idle renderers outlive a job worker.
+    if not workers or workers <= 1 or len(tasks) <= 1:
+        results = [timed_call(fn, args) for fn, args in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            futures = [pool.submit(timed_call, fn, args) for fn, args in tasks]
+            results = [future.result() for future in futures]
+    # Each figure is its own stage, timed where it was drawn
+    if timer is not None:
+        for i, ((fn, _), (_, seconds, peak)) in enumerate(zip(tasks, results)):
+            timer.record(f'plot_{i}_{fn.__name__}', seconds, peak)
+    return [png for png, _, _ in results]
@@ -0,0 +1,228 @@
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# A columnar index of one analysed dataset for the JSON query API. Rows are sorted by their date,
+# so a date range is two binary searches and a slice; labels (category, channel, region) are
+# integer codes into name arrays, so a label filter is one comparison per row of the slice.
+# A code is the name's position plus one; 0 marks a row without that label.
+# Stored as an uncompressed .npz next to the job's other outputs; only numpy is needed to query it.
+LABELS = {'category': 'category', 'channel': 'channel_title', 'region': 'region'}
+VALUES = ['views', 'likes', 'dislikes', 'comment_count', 'engagement_rate']
+# The date a row is filed under: its trending day, or a video's first one after a rollup
+DATE_COLUMNS = ['trending_date', 'first_trending']
+# Rows without a date sort last and fall outside every date range
+NO_DATE = np.iinfo(np.int32).max
+GROUPS = list(LABELS) + ['date']
+PERCENTILES = [10, 25, 50, 75, 90, 99]
+GROUP_LIMIT = 50
+# Loaded indexes kept per web worker, so repeated queries skip reading the file; bounded by the
+# bytes of their arrays, and an index over the whole budget is read for its query alone
+CACHED_INDEX_BYTES = 256 * 1024 * 1024
+# Engagement is also stored as the bucket of its rank over the whole dataset. A percentile of any
+# selection is then a count per bucket plus a sort of the one bucket holding the wanted rank.
+RANK_BUCKETS = 2**16 - 1
+NO_RANK = RANK_BUCKETS
+
+
+class QueryError(ValueError):
+    pass
+
+
+def day_number(value):
+    # 'YYYY-MM-DD' to days since 1970-01-01
+    try:
+        return int(np.datetime64(value, 'D').astype(np.int64))
+    except ValueError:
+        raise QueryError(f"Not a date: {value!r}, expected YYYY-MM-DD")
+
+
+def day_text(day):
+    return str(np.datetime64(int(day), 'D'))
+
+
+def finite(value):
+    # JSON has no NaN
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+class StatsIndex:
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+
+    @classmethod
+    def build(cls, df):
+        # From the analysed frame (rows or videos), in the job that analysed it
+        arrays = {}
+        date_column = next((c for c in DATE_COLUMNS if c in df), None)
+        if date_column is None:
+            days = np.full(len(df), NO_DATE, dtype=np.int64)
+        else:
+            values = df[date_column].to_numpy(dtype='datetime64[ns]')
+            days = np.where(np.isnat(values), NO_DATE, values.astype('datetime64[D]').view(np.int64))
+        order = np.argsort(days, kind='stable')
+        arrays['date'] = days[order].astype(np.int32)
+        for label, column in LABELS.items():
+            if column in df:
+                categorical = df[column].astype('category').cat
+                arrays[label] = categorical.codes.to_numpy()[order].astype(np.int32) + 1
+                arrays[f'{label}_names'] = categorical.categories.astype(str).to_numpy(dtype=str)
+        for column in VALUES:
+            if column in df:
+                arrays[column] = df[column].to_numpy(dtype=np.float64, na_value=np.nan)[order]
+        if 'engagement_rate' in arrays:
+            arrays['engagement_bucket'] = rank_buckets(arrays['engagement_rate'])
+        return cls(arrays)
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        np.savez(buffer, **self.arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as npz:
+            return cls({name: npz[name] for name in npz.files})
+
+    @property
+    def rows(self):
+        return len(self.arrays['date'])
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self.arrays.values())
+
+    def codes(self, label, names):
+        # Codes of the given names; names the dataset does not have match no rows
+        if label not in self.arrays:
+            raise QueryError(f"This dataset has no {label} column")
+        return np.flatnonzero(np.isin(self.arrays[f'{label}_names'], names)) + 1
+
+    def select(self, start=None, end=None, **filters):
+        # The rows in [start, end] (inclusive days) matching every label filter, as a slice of
+        # the date-sorted columns and the positions within it (None when only dates are filtered)
+        dates = self.arrays['date']
+        lo = 0 if start is None else int(np.searchsorted(dates, day_number(start), 'left'))
+        hi = self.rows if end is None else int(np.searchsorted(dates, day_number(end), 'right'))
+        window = slice(lo, max(lo, hi))
+        mask = None
+        for label, names in filters.items():
+            if not names:
+                continue
+            codes = self.arrays[label][window] if label in self.arrays else None
+            wanted = self.codes(label, np.asarray(names, dtype=str))
+            hit = codes == wanted[0] if len(wanted) == 1 else np.isin(codes, wanted)
+            mask = hit if mask is None else mask & hit
+        return window, None if mask is None else np.flatnonzero(mask)
+
+    def column(self, name, window, rows):
+        values = self.arrays[name][window]
+        return values if rows is None else values.take(rows)
+
+    def percentiles(self, window, rows, percentiles):
+        # Same values as np.percentile (linear interpolation) over the finite engagement rates
+        # of the selection, without a selection pass over all of them
+        buckets = self.column('engagement_bucket', window, rows)
+        counts = np.cumsum(np.bincount(buckets, minlength=NO_RANK + 1)[:NO_RANK])
+        total = int(counts[-1])
+        if total == 0:
+            return [None] * len(percentiles)
+        values = self.arrays['engagement_rate'][window]
+        sorted_buckets = {}
+
+        def order_statistic(k):
+            bucket = int(np.searchsorted(counts, k, 'right'))
+            if bucket not in sorted_buckets:
+                inside = np.flatnonzero(buckets == bucket)
+                sorted_buckets[bucket] = np.sort(values.take(inside if rows is None else rows.take(inside)))
+            return sorted_buckets[bucket][k - (int(counts[bucket - 1]) if bucket else 0)]
+
+        result = []
+        for p in percentiles:
+            position = p / 100 * (total - 1)
+            low = int(np.floor(position))
+            a, b = order_statistic(low), order_statistic(min(low + 1, total - 1))
+            result.append(finite(a + (b - a) * (position - low)))
+        return result
+
+    def query(self, start=None, end=None, group=None, percentiles=PERCENTILES, limit=GROUP_LIMIT, **filters):
+        # Grouped by category by default, by date when the upload came without a category map
+        group = group or ('category' if 'category' in self.arrays else 'date')
+        if group not in GROUPS:
+            raise QueryError(f"Unknown group: {group}, expected one of {', '.join(GROUPS)}")
+        window, rows = self.select(start, end, **filters)
+        dates = self.column('date', window, rows)
+        views = self.column('views', window, rows)
+        # Still sorted after filtering, and undated rows are last
+        dated = int(np.searchsorted(dates, NO_DATE))
+        result = {
+            'rows': len(dates),
+            'dates': {'first': day_text(dates[0]), 'last': day_text(dates[dated - 1])} if dated else None,
+            'views': {'mean': finite(views.mean()) if len(views) else None, 'total': finite(views.sum())},
+        }
+        if 'engagement_rate' in self.arrays:
+            values = self.percentiles(window, rows, percentiles)
+            result['engagement_percentiles'] = {f'{p:g}': v for p, v in zip(percentiles, values)}
+        result['group'] = group
+        result['groups'] = self.groups(group, window, rows, dates, views, limit)
+        return result
+
+    def groups(self, group, window, rows, dates, views, limit):
+        # Rows and mean views per group, the groups with most rows first (days in order)
+        if group == 'date':
+            dated = int(np.searchsorted(dates, NO_DATE))
+            # Dates are sorted, so each day is one run
+            starts = np.flatnonzero(np.r_[True, dates[1:dated] != dates[:dated - 1]]) if dated else np.zeros(0, dtype=np.int64)
+            counts = np.diff(np.r_[starts, dated])
+            sums = np.add.reduceat(views[:dated], starts) if dated else np.zeros(0)
+            names = [day_text(day) for day in dates[starts]]
+        elif group in self.arrays:
+            codes = self.column(group, window, rows)
+            size = len(self.arrays[f'{group}_names']) + 1
+            # Slot 0 collects the rows without the label and is left out
+            counts = np.bincount(codes, minlength=size)[1:]
+            sums = np.bincount(codes, weights=views, minlength=size)[1:]
+            names = self.arrays[f'{group}_names']
+        else:
+            raise QueryError(f"This dataset has no {group} column")
+        present = np.flatnonzero(counts)
+        order = present if group == 'date' else present[np.argsort(-counts[present], kind='stable')]
+        return [{'name': str(names[i]), 'rows': int(counts[i]), 'mean_views': finite(sums[i] / counts[i])}
+                for i in order[:limit]]
+
+
+def rank_buckets(values):
+    # Bucket of each value's rank among the finite values; NO_RANK for the rest
+    finite_rows = np.flatnonzero(np.isfinite(values))
+    buckets = np.full(len(values), NO_RANK, dtype=np.uint16)
+    ranked = finite_rows[np.argsort(values[finite_rows], kind='stable')]
+    buckets[ranked] = np.arange(len(ranked), dtype=np.int64) * RANK_BUCKETS // max(len(ranked), 1)
+    return buckets
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def cached_index(path, mtime, max_bytes=CACHED_INDEX_BYTES):
+    # Keyed by modification time too, so a rewritten index is read again
+    key = (path, mtime)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    index = StatsIndex.load(path)
+    if index.nbytes > max_bytes:
+        return index
+    with _indexes_lock:
+        _indexes[key] = index
+        total = sum(cached.nbytes for cached in _indexes.values())
+        while total > max_bytes:
+            _, old = _indexes.popitem(last=False)
+            total -= old.nbytes
+    return index
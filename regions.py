@@ -0,0 +1,25 @@
+import os
+
+# Naming of regional trending files: USvideos.csv pairs with US_category_id.json. Kept free of
+# heavy imports so the web process can name uploads without loading the analysis stack.
+
+CATEGORY_MAP_SUFFIX = '_category_id.json'
+
+
+def region_name(filename):
+    # USvideos.csv and US_category_id.json both belong to region 'US'
+    name = os.path.basename(filename)
+    if name.endswith(CATEGORY_MAP_SUFFIX) and len(name) > len(CATEGORY_MAP_SUFFIX):
+        return name[:-len(CATEGORY_MAP_SUFFIX)]
+    if name.endswith('videos.csv') and len(name) > len('videos.csv'):
+        return name[:-len('videos.csv')]
+    return os.path.splitext(name)[0]
+
+
+def region_names(filenames):
+    # Region names for a list of uploads, suffixed where two files would share one
+    names = []
+    for i, filename in enumerate(filenames):
+        name = region_name(filename)
+        names.append(f'{name}_{i + 1}' if name in names else name)
+    return names
@@ -0,0 +1,433 @@
+import io
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
+
+from features import add_features
+from metrics import StageTimer
+from ingest import load_categories, clean_data, compact_frame, load_chunked, read_csv
+from rollup import check_level, video_rollup
+from stats import compute_stats
+from tags import TagIndex, tag_summary
+from terms import TermCounter
+from query import StatsIndex
+from plots import (correlation_plot, category_plot, scatter_task, histogram_plot, render_plots,
+                   region_plot, category_region_plot, publish_timing_plot, top_tags_plot, keyword_task)
+
+# The analysis pipeline without any web dependencies: the Flask app and the batch CLI both run it
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('FONTSIZE', (0, 1), (-1, -1), 9),
+])
+
+
+def load_data(file_path, cat_path=None, chunksize=None, engine='c', keywords=None, timer=None, tag_parts=None,
+              terms=None):
+    timer = timer or StageTimer()
+    # Load categories if available
+    cat_dict = load_categories(cat_path)
+
+    # Stream the CSV in bounded chunks when asked to, keeping only the columns the analysis uses.
+    # Chunks drop their text, so a tag_parts list collects each chunk's TagIndex instead and a
+    # TermCounter passed as terms counts each chunk's terms.
+    if chunksize:
+        with timer.stage('parse_chunked') as entry:
+            df = load_chunked(file_path, cat_dict, chunksize, keywords=keywords, tag_parts=tag_parts, terms=terms)
+            entry['rows'] = len(df)
+        return df
+
+    # Load CSV; encoding, BOM and delimiter are sniffed from a prefix so the file is parsed once
+    with timer.stage('parse') as entry:
+        df, report = read_csv(file_path, engine=engine)
+        entry['rows'] = len(df)
+
+    # Data cleaning
+    with timer.stage('clean') as entry:
+        df = clean_data(df, cat_dict)
+        entry['rows'] = len(df)
+    df.attrs['ingest'] = report
+    return df
+
+
+def generate_plots(df, workers=None, keywords=None, stats=None, scatter_max_rows=None, scatter_bins=200, timer=None):
+    # Callers passing stats have already derived the features they were computed from
+    if stats is None:
+        add_features(df, keywords=keywords)
+        stats = compute_stats(df)
+    return render_plots(plot_tasks(df, stats, scatter_max_rows, scatter_bins), workers, timer)
+
+
+def plot_tasks(df, stats, scatter_max_rows=None, scatter_bins=200, tags=None, terms=None):
+    # Each figure only receives the columns it draws, so a process pool ships slices, not the frame
+    tasks = []
+    # Correlation
+    tasks.append((correlation_plot, (stats.corr,)))
+
+    # Views by category
+    if stats.category_means is not None:
+        tasks.append((category_plot, (stats.category_means,)))
+
+    # Publish weekday x hour, already reduced to 168 cells by compute_stats
+    if stats.timing is not None:
+        tasks.append((publish_timing_plot, (stats.timing,)))
+
+    # Top tags, already reduced by tag_summary
+    if tags is not None and len(tags.top):
+        tasks.append((top_tags_plot, (tags,)))
+
+    # Engagement
+    tasks.append(scatter_task(df[['views', 'engagement_rate']], 'views', 'engagement_rate', scatter_max_rows, scatter_bins))
+
+    # Title length
+    if 'title_length' in df:
+        tasks.append((histogram_plot, (df['title_length'],)))
+
+    # Tags count
+    if 'tags_count' in df:
+        tasks.append(scatter_task(df[['tags_count', 'views']], 'tags_count', 'views', scatter_max_rows, scatter_bins))
+
+    # Keywords, next to the terms discovered in this dataset
+    if 'keyword_count' in df:
+        tasks.append(keyword_task(df[['keyword_count', 'views']], terms, scatter_max_rows, scatter_bins))
+
+    return tasks
+
+
+def generate_pdf(df, plots, pdf_path=None, stats=None, regions=None, level='rows', tags=None, terms=None):
+    if pdf_path is None:
+        pdf_path = os.path.join(os.getcwd(), 'static', 'report.pdf')
+    # Build next to the target and rename, so a download never sees a half-written report
+    tmp_path = f"{pdf_path}.{os.getpid()}.tmp"
+    doc = SimpleDocTemplate(tmp_path, pagesize=letter)
+    styles = getSampleStyleSheet()
+    styles['Normal'].fontName = 'Courier'  # Monospaced font for better formatting
+    styles['Normal'].fontSize = 10
+    story = []
+
+    # Title
+    story.append(Paragraph("YouTube Trending Video Analysis Report", styles['Title']))
+    story.append(Spacer(1, 12))
+
+    # Data Summary
+    story.append(Paragraph("Data Summary (one row per video):" if level == 'videos' else "Data Summary:", styles['Heading2']))
+    summary_df = (stats or compute_stats(df)).describe.round(2)
+    data = [['Statistic'] + summary_df.columns.tolist()] + [[idx] + row.tolist() for idx, row in summary_df.iterrows()]
+    colWidths = [80] + [70] * len(summary_df.columns)
+    table = Table(data, colWidths=colWidths)
+    table.setStyle(TABLE_STYLE)
+    story.append(table)
+    story.append(Spacer(1, 12))
+
+    # Side-by-side regions of a multi-region report
+    if regions is not None:
+        story.append(Paragraph("Regions:", styles['Heading2']))
+        regions_df = regions.round(2)
+        data = [['Region'] + regions_df.columns.tolist()] + [[idx] + row.tolist() for idx, row in regions_df.iterrows()]
+        table = Table(data, colWidths=[60] + [75] * len(regions_df.columns))
+        table.setStyle(TABLE_STYLE)
+        story.append(table)
+        story.append(Spacer(1, 12))
+
+    # Leading tags of every category
+    if tags is not None and tags.by_category is not None and len(tags.by_category):
+        story.append(Paragraph("Top Tags by Category:", styles['Heading2']))
+        leading = tags.by_category.groupby('group', sort=True)['tag'].agg(', '.join)
+        data = [['Category', 'Tags']] + [[group, Paragraph(line, styles['BodyText'])] for group, line in leading.items()]
+        table = Table(data, colWidths=[130, 370])
+        table.setStyle(TABLE_STYLE)
+        story.append(table)
+        story.append(Spacer(1, 12))
+
+    # Title and description terms over-represented above the high-views threshold
+    if terms is not None and len(terms.top):
+        story.append(Paragraph(f"Terms Associated with High Views (trending rows above {terms.threshold:,.0f} views):",
+                               styles['Heading2']))
+        top = terms.top.round({'high share': 3, 'lift': 2, 'chi2': 1})
+        data = [top.columns.tolist()] + top.values.tolist()
+        table = Table(data, colWidths=[150, 70, 80, 70, 70])
+        table.setStyle(TABLE_STYLE)
+        story.append(table)
+        story.append(Spacer(1, 12))
+
+    # Key Insights
+    story.append(Paragraph("Key Insights:", styles['Heading2']))
+    insights = [
+        "- High engagement (likes/comments) often leads to more views.",
+        "- Certain categories like Music dominate trending lists.",
+        "- Videos with specific keywords or tags may trend faster.",
+        "- Analyze title length and publish timing for better reach."
+    ]
+    for insight in insights:
+        story.append(Paragraph(insight, styles['Normal']))
+    story.append(Spacer(1, 12))
+
+    # Plots
+    story.append(Paragraph("Plots:", styles['Heading2']))
+    for plot in plots:
+        img = Image(io.BytesIO(plot))
+        img.drawHeight = 300
+        img.drawWidth = 500
+        story.append(img)
+        story.append(Spacer(1, 12))
+
+    doc.build(story)
+    os.replace(tmp_path, pdf_path)
+    return pdf_path
+
+
+def analyze_file(file_path, pdf_path, cat_path=None, chunksize=None, engine='c', keywords=None,
+                 plot_workers=None, scatter_max_rows=None, scatter_bins=200, level='rows'):
+    # load_data -> features -> tag index -> [video rollup] -> one statistics pass -> plots -> PDF,
+    # timing each stage
+    check_level(level)
+    timer = StageTimer()
+    tag_parts, terms = [], TermCounter()
+    df = load_data(file_path, cat_path, chunksize=chunksize, engine=engine, keywords=keywords, timer=timer,
+                   tag_parts=tag_parts, terms=terms)
+    with timer.stage('features') as entry:
+        add_features(df, keywords=keywords)
+        entry['rows'] = len(df)
+
+    # The tags are tokenized once here, and the terms counted, before compaction drops the text
+    with timer.stage('tags') as entry:
+        tag_index = build_tag_index(df, tag_parts)
+        entry.update(rows=tag_index.rows, tags=len(tag_index))
+    if not chunksize:
+        with timer.stage('terms') as entry:
+            terms.update(df)
+            entry['rows'] = len(df)
+
+    # Nothing after this point reads the text; counts shrink to their smallest integer type
+    with timer.stage('compact') as entry:
+        memory = compact_frame(df)
+        entry.update(memory, rows=len(df))
+
+    if level == 'videos':
+        with timer.stage('rollup') as entry:
+            df, first_rows = video_rollup(df, first_rows=True)
+            tag_index = tag_index.select(first_rows)
+            entry['rows'] = len(df)
+
+    with timer.stage('stats'):
+        stats = compute_stats(df)
+        tags = tag_summary(tag_index, df)
+        discovered = terms.scores()
+
+    with timer.stage('plots'):
+        plots = render_plots(plot_tasks(df, stats, scatter_max_rows, scatter_bins, tags, discovered), plot_workers,
+                             timer)
+
+    with timer.stage('pdf'):
+        generate_pdf(df, plots, pdf_path, stats=stats, level=level, tags=tags, terms=discovered)
+
+    # Columns sorted by date for the JSON query API
+    with timer.stage('index') as entry:
+        index = StatsIndex.build(df)
+        entry['rows'] = index.rows
+
+    return {
+        'stats': stats,
+        'tags': tags,
+        'terms': discovered,
+        'index': index,
+        'plots': plots,
+        'ingest': df.attrs.get('ingest'),
+        'memory': memory,
+        'timings': stage_timings(timer),
+        'stages': timer.stages,
+    }
+
+
+def stage_timings(timer):
+    # The coarse per-step summary printed by the batch CLI. A multi-region load counts as its wall
+    # time; the per-region stages inside it ran in workers, side by side, and stay in timer.stages.
+    if any(entry['stage'] == 'load_regions' for entry in timer.stages):
+        load = timer.total('load_regions')
+    else:
+        load = timer.total('parse', 'parse_chunked', 'clean', 'features', 'tags', 'terms', 'compact', 'rollup')
+    return {
+        'load_ms': load * 1000,
+        'stats_ms': timer.total('stats') * 1000,
+        'plots_ms': timer.total('plots') * 1000,
+        'pdf_ms': timer.total('pdf') * 1000,
+    }
+
+
+def build_tag_index(df, tag_parts=None):
+    # From the tags column, or from the chunks of a chunked load, which have already dropped it
+    if 'tags' in df:
+        return TagIndex.build(df['tags'])
+    if tag_parts:
+        return TagIndex.concat(tag_parts)
+    return TagIndex.build(pd.Series([np.nan] * len(df), dtype=object))
+
+
+def summary_columns(df):
+    # What the statistics, the plots and the query index read; text columns stay behind in the
+    # region's worker
+    return [c for c in df.columns if c in ('category', 'channel_title') or df[c].dtype.kind in 'iufM']
+
+
+def load_region(file_path, cat_path=None, chunksize=None, engine='c', keywords=None, level='rows'):
+    # One region, parsed, rolled up if asked to, and summarized in its own worker
+    timer = StageTimer()
+    tag_parts, terms = [], TermCounter()
+    df = load_data(file_path, cat_path, chunksize=chunksize, engine=engine, keywords=keywords, timer=timer,
+                   tag_parts=tag_parts, terms=terms)
+    with timer.stage('features') as entry:
+        add_features(df, keep_keywords=False, keywords=keywords)
+        entry['rows'] = len(df)
+    # The tag index and the term counts travel back instead of the text
+    with timer.stage('tags') as entry:
+        tag_index = build_tag_index(df, tag_parts)
+        entry.update(rows=tag_index.rows, tags=len(tag_index))
+    if not chunksize:
+        with timer.stage('terms') as entry:
+            terms.update(df)
+            entry['rows'] = len(df)
+    # Smaller frames also travel back from the worker faster
+    with timer.stage('compact') as entry:
+        entry.update(compact_frame(df), rows=len(df))
+    if level == 'videos':
+        with timer.stage('rollup') as entry:
+            df, first_rows = video_rollup(df, first_rows=True)
+            tag_index = tag_index.select(first_rows)
+            entry['rows'] = len(df)
+    df = df[summary_columns(df)]
+    with timer.stage('region_stats'):
+        stats = compute_stats(df)
+    return df, stats, df.attrs.get('ingest'), timer.stages, tag_index, terms
+
+
+def load_regions(regions, workers=None, **options):
+    # regions is a list of (name, CSV path, category JSON path or None), parsed side by side.
+    # Returns the narrow rows of every region concatenated, with a categorical 'region' column,
+    # one TagIndex over the same rows and the TermCounter of all regions.
+    if not workers or workers <= 1 or len(regions) <= 1:
+        loaded = [load_region(path, cat_path, **options) for _, path, cat_path in regions]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(regions))) as pool:
+            futures = [pool.submit(load_region, path, cat_path, **options) for _, path, cat_path in regions]
+            loaded = [future.result() for future in futures]
+
+    names = [name for name, *_ in regions]
+    frames = [df for df, *_ in loaded]
+    combined = pd.concat(frames, ignore_index=True)
+    combined['region'] = pd.Categorical.from_codes(
+        np.repeat(np.arange(len(frames)), [len(df) for df in frames]), categories=names)
+    region_stats = {name: stats for name, (_, stats, *_) in zip(names, loaded)}
+    ingest = {name: report for name, (_, _, report, *_) in zip(names, loaded)}
+    stages = [entry for *_, region_stages, _, _ in loaded for entry in region_stages]
+    tag_index = TagIndex.concat([index for *_, index, _ in loaded])
+    terms = loaded[0][-1]
+    for *_, other in loaded[1:]:
+        terms.merge(other)
+    return combined, region_stats, ingest, stages, tag_index, terms
+
+
+def region_table(region_stats):
+    # One row per region, read off the summary each worker already computed
+    rows = {}
+    for name, stats in region_stats.items():
+        d = stats.describe
+        rows[name] = {
+            'rows': stats.rows,
+            'mean views': d.loc['mean', 'views'],
+            'median views': d.loc['50%', 'views'],
+            'mean likes': d.loc['mean', 'likes'],
+            'mean comments': d.loc['mean', 'comment_count'],
+            'engagement': d.loc['mean', 'engagement_rate'],
+        }
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def category_region_views(combined):
+    # Mean views per (category, region), categories as rows and regions as columns
+    if 'category' not in combined:
+        return None
+    means = combined.groupby(['category', 'region'], observed=True)['views'].mean()
+    # No categorized rows (e.g. header-only files) leaves nothing to draw
+    return means.unstack('region') if len(means) else None
+
+
+def analyze_regions(regions, pdf_path, workers=None, plot_workers=None, scatter_max_rows=None, scatter_bins=200,
+                    **options):
+    # Several regions into one report: per-region rows in a table, everything else over all rows.
+    # With level='videos' every region is rolled up in its worker, so a video counts once per region.
+    level = check_level(options.get('level', 'rows'))
+    timer = StageTimer()
+    with timer.stage('load_regions') as entry:
+        combined, region_stats, ingest, region_stages, tag_index, terms = load_regions(regions, workers, **options)
+        entry['rows'] = len(combined)
+    timer.extend(region_stages)
+
+    with timer.stage('stats'):
+        stats = compute_stats(combined)
+        regions_df = region_table(region_stats)
+        by_category = category_region_views(combined)
+        tags = tag_summary(tag_index, combined)
+        discovered = terms.scores()
+
+    with timer.stage('plots'):
+        tasks = [(region_plot, (regions_df,))]
+        if by_category is not None:
+            tasks.append((category_region_plot, (by_category,)))
+        plots = render_plots(tasks + plot_tasks(combined, stats, scatter_max_rows, scatter_bins, tags, discovered),
+                             plot_workers, timer)
+
+    with timer.stage('pdf'):
+        generate_pdf(combined, plots, pdf_path, stats=stats, regions=regions_df, level=level, tags=tags,
+                     terms=discovered)
+
+    with timer.stage('index') as entry:
+        index = StatsIndex.build(combined)
+        entry['rows'] = index.rows
+
+    return {
+        'stats': stats,
+        'tags': tags,
+        'terms': discovered,
+        'index': index,
+        'regions': regions_df,
+        'region_stats': region_stats,
+        'plots': plots,
+        'ingest': ingest,
+        'timings': stage_timings(timer),
+        'stages': timer.stages,
+    }
+
+
+# A few rows in the upload format, enough to take every code path of an analysis once
+WARM_UP_CSV = '''video_id,trending_date,title,channel_title,category_id,publish_time,tags,views,likes,dislikes,comment_count,thumbnail_link,comments_disabled,ratings_disabled,video_error_or_removed,description
+a1,17.14.11,Warm up one,ch,10,2017-11-13T17:13:01.000Z,"""music""|""fun""",748374,57527,2966,15954,https://i.ytimg.com/vi/a1/default.jpg,False,False,False,<b>music</b> video\\nhttps://example.com
+b2,17.15.11,Warm up two,ch,24,2017-11-12T12:00:00.000Z,[none],2418783,97185,6146,12703,https://i.ytimg.com/vi/b2/default.jpg,False,False,False,a viral &amp; fun challenge
+c3,17.16.11,Warm up three,ch,10,2017-11-15T08:30:00.000Z,"""tutorial""",3191434,146033,5339,8181,https://i.ytimg.com/vi/c3/default.jpg,False,False,False,
+'''
+
+
+def warm_up(keywords=None):
+    # Pays the one-off costs of a first analysis: imports, matplotlib's font list and glyph
+    # cache, seaborn's defaults, reportlab's fonts and stylesheet, the compiled keyword matcher.
+    # Meant for a pre-fork master (see gunicorn.conf.py) so forked workers inherit all of it.
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'warm_up.csv')
+        with open(csv_path, 'w', encoding='utf-8') as f:
+            f.write(WARM_UP_CSV)
+        analysis = analyze_file(csv_path, os.path.join(tmp, 'warm_up.pdf'), keywords=keywords)
+    return analysis['timings']
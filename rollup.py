@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+# A trending export has one row per video per day it trended. The rollup keeps one row per
+# video so the summary and the plots count every video once, whatever its time on the list.
+LEVELS = ['rows', 'videos']
+
+# Running totals: a video's peak is the largest value recorded on any of its days
+PEAK_COLUMNS = ['views', 'likes', 'dislikes', 'comment_count']
+# Fixed for a video across its days; taken from its first row in file order
+VIDEO_COLUMNS = ['category_id', 'category', 'channel_title', 'publish_time', 'publish_hour', 'publish_weekday', 'publish_month',
+                 'title_length', 'tags_count', 'keyword_count']
+
+
+def check_level(level):
+    if level not in LEVELS:
+        raise ValueError(f"Unknown analysis level: {level}")
+    return level
+
+
+def video_rollup(df, first_rows=False):
+    # One groupby over the cleaned, featured rows; a multi-region frame rolls up per region and video.
+    # With first_rows, also returns the position of each video's first row, in the rollup's order.
+    if 'video_id' not in df:
+        raise ValueError("A video-level analysis needs a video_id column")
+    keys = [k for k in ['region', 'video_id'] if k in df]
+    spec = {}
+    if 'trending_date' in df:
+        spec['first_trending'] = ('trending_date', 'min')
+        spec['last_trending'] = ('trending_date', 'max')
+        spec['days_trending'] = ('trending_date', 'nunique')
+    spec.update({c: (c, 'max') for c in PEAK_COLUMNS if c in df})
+    spec.update({c: (c, 'first') for c in VIDEO_COLUMNS if c in df})
+    grouped = df.groupby(keys, sort=False, observed=True)
+    videos = grouped.agg(**spec).reset_index()
+
+    # Features that depend on the counts are taken at the peak, not averaged over days
+    if 'first_trending' in videos and 'publish_time' in videos:
+        to_trend = videos['first_trending'] - videos['publish_time']
+        videos['days_to_trend'] = to_trend.dt.days
+        videos['hours_to_trend'] = to_trend // pd.Timedelta(hours=1)
+    engaged = videos['likes'].astype('float64') + videos['dislikes'] + videos['comment_count']
+    videos['engagement_rate'] = engaged / videos['views']
+    videos.attrs = df.attrs
+    if first_rows:
+        # Groups are numbered in order of first appearance; rows with a missing key are -1
+        groups, positions = np.unique(grouped.ngroup().to_numpy(), return_index=True)
+        return videos, positions[groups >= 0]
+    return videos
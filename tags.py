@@ -0,0 +1,194 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# The tags column is split once into an interned vocabulary and a sparse row -> tag matrix in
+# CSR form (indptr/indices), so every tag question afterwards is integer work on the ids.
+# Tags look like "music"|"official video"; '[none]' is how the exports mark an untagged video.
+SEPARATOR = '|'
+NO_TAGS = '[none]'
+# Tags shown in the summary, per category, and in the co-occurrence grid
+TOP_TAGS = 20
+TOP_PER_CATEGORY = 5
+COOCCURRENCE_TAGS = 15
+# Rows expanded to a dense indicator block at a time when counting co-occurrence
+COOCCURRENCE_BLOCK = 100000
+
+
+def normalize(tag):
+    # Tags differ in quoting and case between uploads of the same video
+    return tag.strip().strip('"').strip().lower()
+
+
+def piece_counts(tags):
+    # Same values as tags.str.split('|').str.len() ('[none]' counts as one, missing stays NaN),
+    # counted once per distinct string instead of building a list for every row
+    codes, uniques = pd.factorize(tags)
+    counts = np.array([value.count(SEPARATOR) + 1 for value in uniques], dtype=np.float64)
+    result = np.where(codes >= 0, counts[codes] if len(counts) else np.nan, np.nan)
+    if (codes >= 0).all():
+        result = result.astype(np.int64)
+    return pd.Series(result, index=tags.index, name=tags.name)
+
+
+class TagSummary(namedtuple('TagSummary', ['top', 'by_category', 'cooccurrence', 'vocabulary'])):
+    # What the report shows of the index: small frames, cheap to cache with the result
+    __slots__ = ()
+
+
+class TagIndex:
+    # Row i of the frame the index was built from has tags vocabulary[indices[indptr[i]:indptr[i + 1]]]
+
+    def __init__(self, vocabulary, indptr, indices):
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.indices = indices
+        self._ids = None
+        self._entry_rows = None
+
+    @classmethod
+    def build(cls, tags):
+        # Strings repeat on every day a video trends, so each distinct one is tokenized once and
+        # its tag ids are gathered back out to the rows through the factorized codes
+        codes, uniques = pd.factorize(tags)
+        ids = {}
+        unique_ptr = [0]
+        unique_indices = []
+        for value in uniques:
+            seen = set()
+            for piece in value.split(SEPARATOR):
+                tag = normalize(piece)
+                if tag and tag != NO_TAGS and tag not in seen:
+                    seen.add(tag)
+                    unique_indices.append(ids.setdefault(tag, len(ids)))
+            unique_ptr.append(len(unique_indices))
+        unique_ptr = np.array(unique_ptr, dtype=np.int64)
+        unique_indices = np.array(unique_indices, dtype=np.int32)
+
+        valid = codes >= 0
+        safe = np.where(valid, codes, 0)
+        lengths = np.where(valid, np.diff(unique_ptr)[safe] if len(uniques) else 0, 0)
+        indptr = np.zeros(len(codes) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        offsets = np.arange(indptr[-1]) - np.repeat(indptr[:-1], lengths)
+        indices = unique_indices[np.repeat(unique_ptr[safe], lengths) + offsets]
+        vocabulary = np.array(list(ids), dtype=object)
+        return cls(vocabulary, indptr, indices)
+
+    @classmethod
+    def concat(cls, indexes):
+        # Stacks the rows of several indexes (e.g. chunks or regions), merging their vocabularies
+        ids = {}
+        indptrs, indices = [np.zeros(1, dtype=np.int64)], []
+        offset = 0
+        for index in indexes:
+            remap = np.array([ids.setdefault(tag, len(ids)) for tag in index.vocabulary], dtype=np.int32)
+            indices.append(remap[index.indices] if len(remap) else index.indices)
+            indptrs.append(index.indptr[1:] + offset)
+            offset += index.indptr[-1]
+        return cls(np.array(list(ids), dtype=object), np.concatenate(indptrs),
+                   np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32))
+
+    @property
+    def rows(self):
+        return len(self.indptr) - 1
+
+    def __len__(self):
+        return len(self.vocabulary)
+
+    def tag_id(self, tag):
+        if self._ids is None:
+            self._ids = {tag: i for i, tag in enumerate(self.vocabulary)}
+        return self._ids.get(normalize(tag), -1)
+
+    def entry_rows(self):
+        # The row of every stored (row, tag) entry, the expanded form of indptr
+        if self._entry_rows is None:
+            self._entry_rows = np.repeat(np.arange(self.rows), np.diff(self.indptr))
+        return self._entry_rows
+
+    def counts(self):
+        # Rows carrying each tag
+        return np.bincount(self.indices, minlength=len(self))
+
+    def mean_views(self, views):
+        # Mean of a per-row value (aligned with the rows the index was built from) per tag
+        values = np.asarray(views, dtype=np.float64)[self.entry_rows()]
+        valid = ~np.isnan(values)
+        sums = np.bincount(self.indices[valid], weights=values[valid], minlength=len(self))
+        counts = np.bincount(self.indices[valid], minlength=len(self))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return sums / counts
+
+    def top(self, n=TOP_TAGS, views=None):
+        # The n most common tags, most common first, ties broken by tag
+        counts = self.counts()
+        order = np.lexsort((self.vocabulary, -counts))[:n]
+        order = order[counts[order] > 0]
+        top = pd.DataFrame({'tag': self.vocabulary[order], 'rows': counts[order]})
+        if views is not None:
+            top['mean views'] = self.mean_views(views)[order]
+        return top
+
+    def top_by_group(self, groups, n=TOP_PER_CATEGORY):
+        # The n most common tags within each group (e.g. category) of the rows
+        codes, labels = pd.factorize(groups, sort=True)
+        entry_groups = codes[self.entry_rows()]
+        keep = entry_groups >= 0
+        keys, counts = np.unique(entry_groups[keep].astype(np.int64) * len(self) + self.indices[keep],
+                                 return_counts=True)
+        group, tag = keys // max(len(self), 1), keys % max(len(self), 1)
+        order = np.lexsort((self.vocabulary[tag], -counts, group))
+        group, tag, counts = group[order], tag[order], counts[order]
+        # Rank within the group: position minus the position where the group starts
+        starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]]) if len(group) else np.zeros(0, dtype=np.int64)
+        rank = np.arange(len(group)) - np.repeat(starts, np.diff(np.r_[starts, len(group)]))
+        first = rank < n
+        return pd.DataFrame({'group': np.asarray(labels, dtype=object)[group[first]],
+                             'tag': self.vocabulary[tag[first]], 'rows': counts[first]})
+
+    def cooccurrence(self, n=COOCCURRENCE_TAGS, tags=None, block=COOCCURRENCE_BLOCK):
+        # Rows carrying both tags, for every pair of the n most common tags (or of the given tags).
+        # Only the chosen columns are expanded, a block of rows at a time, so memory stays bounded.
+        if tags is None:
+            chosen = self.top(n)['tag'].to_numpy()
+        else:
+            chosen = np.array([normalize(tag) for tag in tags if self.tag_id(tag) >= 0], dtype=object)
+        column = np.full(len(self), -1, dtype=np.int64)
+        column[[self.tag_id(tag) for tag in chosen]] = np.arange(len(chosen))
+        entry_columns = column[self.indices]
+        grid = np.zeros((len(chosen), len(chosen)), dtype=np.int64)
+        for start in range(0, self.rows, block):
+            stop = min(start + block, self.rows)
+            lo, hi = self.indptr[start], self.indptr[stop]
+            cols = entry_columns[lo:hi]
+            keep = cols >= 0
+            dense = np.zeros((stop - start, len(chosen)), dtype=np.float32)
+            dense[self.entry_rows()[lo:hi][keep] - start, cols[keep]] = 1
+            grid += (dense.T @ dense).astype(np.int64)
+        return pd.DataFrame(grid, index=chosen, columns=chosen)
+
+    def mask(self, *tags):
+        # Rows carrying any of the tags, as a boolean mask for the frame the index was built from
+        ids = [self.tag_id(tag) for tag in tags]
+        hits = np.isin(self.indices, [i for i in ids if i >= 0])
+        mask = np.zeros(self.rows, dtype=bool)
+        mask[self.entry_rows()[hits]] = True
+        return mask
+
+    def select(self, rows):
+        # A new index over the given row positions (or boolean mask), in that order
+        rows = np.flatnonzero(rows) if np.asarray(rows).dtype == bool else np.asarray(rows, dtype=np.int64)
+        starts, lengths = self.indptr[rows], np.diff(self.indptr)[rows]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        offsets = np.arange(indptr[-1]) - np.repeat(indptr[:-1], lengths)
+        return TagIndex(self.vocabulary, indptr, self.indices[np.repeat(starts, lengths) + offsets])
+
+
+def tag_summary(index, df):
+    # Top tags with their mean views, the leading tags of each category and how the top tags pair up
+    views = df['views'].to_numpy(dtype=np.float64) if 'views' in df else None
+    by_category = index.top_by_group(df['category']) if 'category' in df else None
+    return TagSummary(index.top(views=views), by_category, index.cooccurrence(), len(index))
@@ -0,0 +1,171 @@
+import re
+import zlib
+from collections import namedtuple
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from keywords import strip_markup
+
+# Keyword discovery: every title + description is a document, its distinct terms are hashed into
+# a fixed number of buckets, and each bucket counts documents per band of views. Memory is set by
+# the hash width alone, so a counter can run over chunks, files or regions and be merged.
+HASH_BITS = 17
+# Views are banded on a log10 scale, a quarter decade per band, from 100 to 100M (clamped)
+VIEW_BANDS = 24
+LOG_VIEWS_LOW = 2.0
+LOG_VIEWS_STEP = 0.25
+# "High views" is the top band edge that leaves closest to this share of documents above it
+HIGH_SHARE = 0.25
+# Terms in fewer documents than this are not scored
+MIN_ROWS = 20
+TOP_TERMS = 20
+
+URL_RE = re.compile(r'https?://\S+|www\.\S+')
+# Letters only, three or more; the exports store line breaks as a literal backslash-n
+TERM_RE = re.compile(r'[^\W\d_]{3,}')
+STOPWORDS = frozenset('''
+    the and for you your with this that are from have has was were will can not but all our out
+    get got just more new now one two off its his her she him they them their there what when
+    who how why which into about over than then also very here only some any each been being
+    http https www com html amp youtube video videos watch channel subscribe follow like
+'''.split())
+
+
+class DiscoveredTerms(namedtuple('DiscoveredTerms', ['top', 'threshold', 'rows', 'high_rows'])):
+    # The scored terms of a counter: small, cheap to cache with the result
+    __slots__ = ()
+
+
+def terms_of(text):
+    # Terms of one document, repeats and stopwords included
+    return TERM_RE.findall(text.lower().replace('\\n', ' '))
+
+
+def term_list(text):
+    # Distinct terms of one document, in order of first appearance
+    return list(dict.fromkeys(t for t in terms_of(text) if t not in STOPWORDS))
+
+
+def bucket(term, bits=HASH_BITS):
+    # crc32 rather than hash(): the same term lands in the same bucket in every process
+    return zlib.crc32(term.encode('utf-8')) & ((1 << bits) - 1)
+
+
+def view_bands(views):
+    logs = np.log10(np.maximum(np.asarray(views, dtype=np.float64), 1))
+    bands = np.floor((logs - LOG_VIEWS_LOW) / LOG_VIEWS_STEP)
+    return np.clip(np.nan_to_num(bands, nan=0), 0, VIEW_BANDS - 1).astype(np.int64)
+
+
+class TermCounter:
+    # Documents per (bucket, views band), plus one example term per bucket to name it by
+
+    def __init__(self, bits=HASH_BITS):
+        self.bits = bits
+        self.counts = np.zeros((1 << bits, VIEW_BANDS), dtype=np.uint32)
+        self.rows = np.zeros(VIEW_BANDS, dtype=np.int64)
+        self.names = np.full(1 << bits, None, dtype=object)
+
+    def reset(self):
+        self.counts[:] = 0
+        self.rows[:] = 0
+        self.names[:] = None
+
+    def documents(self, df):
+        # Codes of each row's (title, description) pair and the text of each distinct pair, markup
+        # and links removed; a video repeats its text on every day it trends, so this is far
+        # fewer strings than rows
+        columns = [c for c in ['title', 'description'] if c in df]
+        if not columns:
+            return None, None
+        codes = np.zeros(len(df), dtype=np.int64)
+        parts = []
+        for column in columns:
+            part_codes, uniques = pd.factorize(df[column].fillna(''))
+            codes = codes * max(len(uniques), 1) + part_codes
+            parts.append((part_codes, pd.Series(uniques, dtype=object)))
+        _, first, codes = np.unique(codes, return_index=True, return_inverse=True)
+        text = None
+        for column, (part_codes, uniques) in zip(columns, parts):
+            if column == 'description':
+                uniques = strip_markup(uniques).str.replace(URL_RE, ' ', regex=True)
+            values = uniques.to_numpy()[part_codes[first]]
+            text = values if text is None else text + ' ' + values
+        return codes, text
+
+    def update(self, df):
+        # Adds the rows of a cleaned frame or chunk; each distinct document is tokenized once
+        codes, uniques = self.documents(df)
+        if codes is None or not len(df):
+            return self
+        bands = view_bands(df['views'])
+        # Only the distinct terms of the chunk are hashed; a document's terms become its buckets
+        doc_terms = [terms_of(doc) for doc in uniques]
+        term_codes, vocabulary = pd.factorize(pd.Series(list(chain.from_iterable(doc_terms)), dtype=object))
+        buckets = np.array([-1 if term in STOPWORDS else bucket(term, self.bits) for term in vocabulary],
+                           dtype=np.int64)
+        # The first term seen in a bucket names it
+        hashed = np.flatnonzero(buckets >= 0)
+        named, first = np.unique(buckets[hashed], return_index=True)
+        unnamed = np.equal(self.names[named], None)
+        self.names[named[unnamed]] = np.asarray(vocabulary, dtype=object)[hashed[first]][unnamed]
+        doc_of = np.repeat(np.arange(len(doc_terms)), [len(terms) for terms in doc_terms])
+        entry_buckets = buckets[term_codes] if len(buckets) else np.zeros(0, dtype=np.int64)
+        keep = entry_buckets >= 0
+        # Distinct (document, bucket) pairs, sorted by document: the documents' bucket lists
+        pairs = np.unique(doc_of[keep] << self.bits | entry_buckets[keep])
+        ids = pairs & ((1 << self.bits) - 1)
+        ptr = np.searchsorted(pairs >> self.bits, np.arange(len(doc_terms) + 1))
+        self.rows += np.bincount(bands, minlength=VIEW_BANDS)
+
+        # Rows per (document, band), then every term of the document gets that many
+        pairs, weights = np.unique(codes * VIEW_BANDS + bands, return_counts=True)
+        docs, doc_bands = pairs // VIEW_BANDS, pairs % VIEW_BANDS
+        lengths = np.diff(ptr)[docs]
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        cells = ids[np.repeat(ptr[docs], lengths) + offsets] * VIEW_BANDS + np.repeat(doc_bands, lengths)
+        cells, inverse = np.unique(cells, return_inverse=True)
+        flat = self.counts.reshape(-1)
+        flat[cells] += np.bincount(inverse, weights=np.repeat(weights, lengths)).astype(np.uint32)
+        return self
+
+    def merge(self, other):
+        if other.bits != self.bits:
+            raise ValueError("Term counters with different hash widths cannot be merged")
+        self.counts += other.counts
+        self.rows += other.rows
+        unnamed = np.equal(self.names, None)
+        self.names[unnamed] = other.names[unnamed]
+        return self
+
+    def high_band(self):
+        # First band of "high views": the edge leaving closest to HIGH_SHARE of rows above it
+        total = self.rows.sum()
+        above = total - np.concatenate([[0], np.cumsum(self.rows)[:-1]])
+        return int(np.argmin(np.abs(above[1:] / max(total, 1) - HIGH_SHARE))) + 1
+
+    def scores(self, n=TOP_TERMS, min_rows=MIN_ROWS):
+        # Terms over-represented among high-view rows, by chi-square on the 2x2 table of
+        # (has term, high views), keeping only positive associations (lift above 1)
+        k = self.high_band()
+        total, high_total = int(self.rows.sum()), int(self.rows[k:].sum())
+        # No rows (e.g. a header-only upload) leaves nothing to keep below; avoid 0 / 0 on the way
+        high_rate = high_total / total if total else 0.0
+        docs = self.counts.sum(axis=1, dtype=np.int64)
+        high = self.counts[:, k:].sum(axis=1, dtype=np.int64)
+        keep = np.flatnonzero((docs >= min_rows) & (docs < total))
+        a, b = high[keep].astype(np.float64), docs[keep].astype(np.float64)
+        c, d = high_total - a, total - high_total - (b - a)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            chi2 = total * (a * d - (b - a) * c) ** 2 / (b * (total - b) * high_total * (total - high_total))
+            lift = (a / b) / high_rate
+        chi2 = np.nan_to_num(chi2)
+        positive = lift > 1
+        keep, chi2, lift, a, b = keep[positive], chi2[positive], lift[positive], a[positive], b[positive]
+        order = np.argsort(-chi2, kind='stable')[:n]
+        top = pd.DataFrame({'term': self.names[keep[order]], 'rows': b[order].astype(np.int64),
+                            'high share': a[order] / b[order], 'lift': lift[order], 'chi2': chi2[order]})
+        threshold = 10 ** (LOG_VIEWS_LOW + k * LOG_VIEWS_STEP)
+        return DiscoveredTerms(top, threshold, total, high_total)
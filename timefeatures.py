@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+# Date columns repeat heavily (a few hundred trending days over hundreds of thousands of rows),
+# so each distinct string is parsed once and the result broadcast back through its codes. Every
+# derived feature is integer arithmetic on nanoseconds since the epoch.
+NS_PER_HOUR = 3600 * 10**9
+NS_PER_DAY = 24 * NS_PER_HOUR
+NAT = np.iinfo(np.int64).min
+
+
+def parse_dates(values, format=None):
+    # Same result as pd.to_datetime(values, format=format, errors='coerce') with any timezone
+    # dropped, but the parser only sees the distinct values
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Index(uniques, dtype=object), format=format, errors='coerce')
+    if parsed.tz is not None:
+        parsed = parsed.tz_localize(None)
+    epoch = parsed.as_unit('ns').asi8
+    # Missing strings get code -1 and come out as NaT
+    ns = np.where(codes >= 0, epoch[codes] if len(epoch) else NAT, NAT)
+    return pd.Series(ns.view('datetime64[ns]'), index=values.index, name=values.name)
+
+
+def epoch_ns(dates):
+    return dates.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+
+def with_missing(values, valid):
+    # Plain int64 when every input was present, float64 with NaN otherwise (as .dt.days gives)
+    return values if valid.all() else np.where(valid, values, np.nan)
+
+
+def civil_month(days):
+    # Month (1-12) of days since 1970-01-01, from Howard Hinnant's civil_from_days
+    z = days + 719468
+    era = np.floor_divide(z, 146097)
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    return np.where(mp < 10, mp + 3, mp - 9)
+
+
+def time_features(df):
+    # days_to_trend, hours_to_trend, publish_hour, publish_weekday (Monday=0) and publish_month
+    if 'publish_time' not in df:
+        return df
+    published = epoch_ns(df['publish_time'])
+    has_publish = published != NAT
+    if 'trending_date' in df:
+        trending = epoch_ns(df['trending_date'])
+        valid = has_publish & (trending != NAT)
+        delta = np.where(valid, trending - published, 0)
+        # Floor division, so a video trending 1 hour before its publish time is at day -1 like Timedelta.days
+        df['days_to_trend'] = with_missing(delta // NS_PER_DAY, valid)
+        df['hours_to_trend'] = with_missing(delta // NS_PER_HOUR, valid)
+    days = np.floor_divide(np.where(has_publish, published, 0), NS_PER_DAY)
+    df['publish_hour'] = with_missing(np.where(has_publish, published, 0) // NS_PER_HOUR % 24, has_publish)
+    # 1970-01-01 was a Thursday
+    df['publish_weekday'] = with_missing((days + 3) % 7, has_publish)
+    df['publish_month'] = with_missing(civil_month(days), has_publish)
+    return df
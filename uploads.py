@@ -0,0 +1,149 @@
+import hashlib
+import io
+import json
+import os
+import time
+
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+from artifacts import atomic_write
+from jobs import JobCancelled
+
+# Uploads are read from the request body in blocks of this size and written straight into the
+# job directory, hashed on the way, so the digest never needs a second pass over the file
+READ_BYTES = 256 * 1024
+# How often a job parsing an upload that is still arriving looks for more bytes
+POLL_SECONDS = 0.02
+# A job gives up on an upload that has not grown for this long (e.g. the web worker died)
+STALL_SECONDS = 120
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class UploadIncomplete(Exception):
+    # The upload a job was parsing stopped before its end: client gone, too large, or malformed
+    pass
+
+
+def stream_parts(stream, boundary, max_bytes, block_size=READ_BYTES):
+    # Multipart events as the body arrives: ('file', field, filename), then ('data', bytes) for
+    # its content. Nothing is buffered beyond one block, and the size limit is enforced as we go.
+    decoder = MultipartDecoder(boundary.encode('latin1'))
+    received = 0
+    while True:
+        block = stream.read(block_size)
+        received += len(block)
+        if received > max_bytes:
+            raise UploadTooLarge(f"Upload is larger than the {max_bytes // (1024 * 1024)} MB limit")
+        decoder.receive_data(block or None)
+        event = decoder.next_event()
+        while not isinstance(event, (NeedData, Epilogue)):
+            if isinstance(event, File):
+                yield 'file', event.name, event.filename
+            elif isinstance(event, Data):
+                yield 'data', event.data
+            elif isinstance(event, Field):
+                yield 'field', event.name, None
+            event = decoder.next_event()
+        if isinstance(event, Epilogue):
+            return
+        if not block:
+            raise ValueError("Upload ended before the request body was complete")
+
+
+class UploadWriter:
+    # One uploaded file, written as it arrives. Readers of a file that is still open see every
+    # byte written so far; the marker files next to it tell them how the upload ended.
+
+    def __init__(self, path, filename):
+        self.path = path
+        self.filename = filename
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._f = open(path, 'wb')
+
+    def write(self, data):
+        self._hash.update(data)
+        self._f.write(data)
+        self._f.flush()
+        self.size += len(data)
+
+    def digest(self):
+        return self._hash.hexdigest()
+
+    def close(self):
+        if not self._f.closed:
+            self._f.close()
+
+    def finish(self, **info):
+        # Readers reach EOF; info (e.g. the cache key) travels to the job through the marker
+        self.close()
+        atomic_write(self.path + '.done', json.dumps(dict(info, digest=self.digest(), size=self.size)).encode('utf-8'))
+
+    def fail(self, error):
+        self.close()
+        atomic_write(self.path + '.failed', json.dumps({'error': error}).encode('utf-8'))
+
+    def cancel(self):
+        # Readers raise JobCancelled; the file itself stays for whoever still needs it
+        self.close()
+        atomic_write(self.path + '.cancelled', b'')
+
+
+class GrowingFile(io.RawIOBase):
+    # Reads a file that an UploadWriter in another process may still be writing, waiting for
+    # more bytes instead of returning EOF until the upload is marked finished
+
+    def __init__(self, path, poll=POLL_SECONDS, stall=STALL_SECONDS):
+        self.path = path
+        self.poll = poll
+        self.stall = stall
+        self._f = open(path, 'rb')
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        waited = 0
+        while True:
+            # Checked before every block, not only at the end of the bytes so far: a cancelled
+            # parse stops at once instead of first catching up with the whole upload
+            if os.path.exists(self.path + '.cancelled'):
+                raise JobCancelled()
+            n = self._f.readinto(b)
+            if n:
+                return n
+            if os.path.exists(self.path + '.done'):
+                # Bytes written between the read above and the marker
+                return self._f.readinto(b)
+            if os.path.exists(self.path + '.failed'):
+                with open(self.path + '.failed', encoding='utf-8') as f:
+                    raise UploadIncomplete(json.load(f)['error'])
+            if waited > self.stall:
+                raise UploadIncomplete(f"Upload stopped arriving for {self.stall} seconds")
+            time.sleep(self.poll)
+            waited += self.poll
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+class GrowingUpload:
+    # Stands in for a file path in ingest: every open() starts a new read from the beginning
+
+    def __init__(self, path):
+        self.path = path
+
+    def open(self):
+        return io.BufferedReader(GrowingFile(self.path), READ_BYTES)
+
+    def info(self):
+        # What the web worker recorded when the upload finished
+        with open(self.path + '.done', encoding='utf-8') as f:
+            return json.load(f)
+
+    def __str__(self):
+        return self.path